@@ -0,0 +1,108 @@
+import collections
+import threading
+import time
+import numpy as np
+from PIL import Image
+from typing import Optional
+from diskCache import DiskCache
+from paletteMap import BLACK, WHITE, PaletteMap
+
+
+def dominant_color(image: Image.Image, pmap: PaletteMap, thumb_px: int = 64, min_chroma: float = 16) -> Optional[tuple]:
+    """Most prominent colorful palette color of an image
+
+    The image is box-reduced to about thumb_px, every pixel is mapped to the
+    palette through the lookup table and the palette histogram is weighted by
+    chroma, so gray and washed out areas barely count. Black and white never
+    win.
+
+    Args:
+        image (Image.Image): album cover
+        pmap (PaletteMap): panel palette
+        thumb_px (int, optional): longest side of the analysed thumbnail
+        min_chroma (float, optional): mean chroma weight per pixel below which the cover has no accent
+
+    Returns:
+        Optional[tuple]: palette color or None for covers without an accent
+    """
+    factor = max(1, max(image.size) // thumb_px)
+    thumb = image.convert('RGB').reduce(factor) if factor > 1 else image.convert('RGB')
+    rgb = np.asarray(thumb)
+    chroma = rgb.max(axis=-1).astype(np.int16) - rgb.min(axis=-1)
+    hist = np.bincount(pmap.indices(rgb).ravel(), weights=chroma.ravel(), minlength=len(pmap.colors))
+    hist[[pmap.index(BLACK), pmap.index(WHITE)]] = 0
+    if hist.max() < min_chroma * chroma.size:
+        return None
+    return pmap.colors[int(hist.argmax())]
+
+
+class AccentCache(DiskCache):
+    """Accent color per album, in memory and on disk.
+
+    An entry is the three RGB bytes of the accent, or empty for albums
+    without one. The cost of every extraction is kept so it can be checked
+    against the per track budget.
+    """
+
+    SUFFIX = '.accent'
+
+    def __init__(self, cache_dir: str, max_bytes: int, pmap: PaletteMap, logger, budget_ms: float = 10, samples: int = 100):
+        """
+        Args:
+            cache_dir (str): directory holding the cached accents
+            max_bytes (int): byte budget of the cache directory
+            pmap (PaletteMap): panel palette the accents are snapped to
+            logger: service logger
+            budget_ms (float, optional): extractions slower than this are logged as warning
+            samples (int, optional): extraction times kept
+        """
+        super().__init__(cache_dir, max_bytes, logger)
+        self.pmap = pmap
+        self.budget_ms = budget_ms
+        # album id -> accent of recently shown albums, shared by the render and pre-warming threads
+        self._memory = {}
+        self.memory_entries = 512
+        self._cost_ms = collections.deque(maxlen=samples)
+        self._memory_lock = threading.Lock()
+
+    def get(self, key: str, cover: Image.Image) -> Optional[tuple]:
+        """Return the accent of an album, extracting it from cover on a miss
+
+        Args:
+            key (str): album id
+            cover (Image.Image): album cover
+
+        Returns:
+            Optional[tuple]: palette color or None if the cover has no accent
+        """
+        with self._memory_lock:
+            if key in self._memory:
+                return self._memory[key]
+        data = self.get_bytes(key)
+        if data is not None and len(data) in (0, 3):
+            accent = tuple(data) or None
+        else:
+            start = time.perf_counter()
+            accent = dominant_color(cover, self.pmap)
+            cost_ms = (time.perf_counter() - start) * 1000
+            with self._memory_lock:
+                self._cost_ms.append(cost_ms)
+            log = self.logger.warning if cost_ms > self.budget_ms else self.logger.debug
+            log(f'Accent color extracted in {cost_ms:.1f}ms')
+            self.put_bytes(key, bytes(accent or ()))
+        with self._memory_lock:
+            if key not in self._memory and len(self._memory) >= self.memory_entries:
+                self._memory.pop(next(iter(self._memory)))
+            self._memory[key] = accent
+        return accent
+
+    def cost_stats(self) -> dict:
+        """count, last, mean and max extraction time in ms of the kept samples"""
+        with self._memory_lock:
+            samples = list(self._cost_ms)
+        if not samples:
+            return {'count': 0}
+        return {'count': len(samples),
+                'last': samples[-1],
+                'mean': sum(samples) / len(samples),
+                'max': max(samples)}
@@ -0,0 +1,63 @@
+import os
+import threading
+from PIL import Image, ImageFont
+
+RESOURCES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'resources')
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'images')
+
+
+class AssetRegistry:
+    """Fonts and images used by _gen_pic, loaded once at startup.
+
+    FreeType faces are parsed once per size and the Spotify logo is decoded
+    once and kept pre-scaled for every height the layout draws it at, so
+    rendering a frame does no file I/O. Sizes that were not preloaded are
+    loaded on first use and kept as well.
+    """
+
+    def __init__(self, logger, font_path: str = None, logo_path: str = None, font_sizes=(), logo_heights=()):
+        """
+        Args:
+            logger: service logger
+            font_path (str, optional): font file, defaults to resources/NotoSans-Regular.ttf
+            logo_path (str, optional): logo file, defaults to images/spotify_logo.png
+            font_sizes (iterable, optional): font sizes to preload
+            logo_heights (iterable, optional): logo heights to preload
+        """
+        self.logger = logger
+        self.font_path = font_path or os.path.join(RESOURCES_DIR, 'NotoSans-Regular.ttf')
+        self.logo_path = logo_path or os.path.join(IMAGES_DIR, 'spotify_logo.png')
+        self._lock = threading.Lock()
+        self._fonts = {}
+        self._logos = {}
+        try:
+            with Image.open(self.logo_path) as img:
+                self._logo = img.convert('RGBA')
+        except OSError as e:
+            self.logger.warning(f'Could not load Spotify logo: {e}')
+            self._logo = None
+        for size in font_sizes:
+            self.font(size)
+        for height in logo_heights:
+            self.logo(height)
+
+    def font(self, size: int) -> ImageFont:
+        """Return the font at the given size"""
+        with self._lock:
+            if size not in self._fonts:
+                try:
+                    self._fonts[size] = ImageFont.truetype(self.font_path, size)
+                except OSError as e:
+                    self.logger.error(f"Font loading error: {e}, using default.")
+                    self._fonts[size] = ImageFont.load_default()
+            return self._fonts[size]
+
+    def logo(self, height: int):
+        """Return the Spotify logo scaled to the given height or None if it is missing"""
+        if self._logo is None:
+            return None
+        with self._lock:
+            if height not in self._logos:
+                ratio = self._logo.width / self._logo.height
+                self._logos[height] = self._logo.resize((int(height * ratio), height), Image.Resampling.LANCZOS)
+            return self._logos[height]
@@ -0,0 +1,182 @@
+"""Render frames for a list of tracks without the panel or the network.
+
+Usage: python batchRender.py manifest.json|manifest.csv --out DIR [--config eink_options.ini]
+                             [--frame-cache] [--no-png] [--no-pack] [--workers N]
+
+The manifest lists one track per entry (JSON: a list of objects, CSV: a
+header row) with the fields
+
+  title, artist   text drawn on the frame
+  cover           local cover file, relative to the manifest; empty for the placeholder
+  cover_url       Spotify cover url, part of the frame cache key; must be
+                  album.images[0].url (the largest variant), which the service
+                  keys its frames on, any other variant never hits
+  name            output file name, defaults to the row number
+
+Every track is rendered with the configured layout, dither and accent
+settings through SpotipiEinkDisplay._gen_pic and packed by the panel
+driver of the configured model, the same way the service does it. No panel
+is needed, the drivers only pack. A frame equals the one the service
+renders only if the local cover is the same image variant the service
+downloads for that track (the smallest Spotify variant covering the
+layout, see _select_cover_url); other resolutions give other pixels. Results
+are written as <name>.png and the packed buffer as <name>.bin. With
+--frame-cache the packed frames of tracks with cover and cover_url are
+stored in the service's frame cache, so the service later shows them
+without rendering; a running service picks them up on its next lookup. The work is spread over a process pool. With --no-pack
+the panel libraries are not needed.
+"""
+import argparse
+import configparser
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from PIL import Image
+
+from accentCache import dominant_color
+from coverCache import CoverCache
+from frameCache import FrameCache
+from spotipiEinkDisplay import SpotipiEinkDisplay
+
+CONFIG_FILE = os.path.join(os.path.dirname(__file__), '..', 'config', 'eink_options.ini')
+
+# the render instance of a worker process
+_service: Optional[SpotipiEinkDisplay] = None
+
+
+def load_manifest(path: str) -> list:
+    """Rows of a JSON or CSV manifest as dicts, cover paths made absolute"""
+    with open(path, newline='') as f:
+        if path.lower().endswith('.csv'):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    for number, row in enumerate(rows):
+        row['name'] = row.get('name') or f'{number:05d}'
+        if row.get('cover'):
+            row['cover'] = os.path.join(base, row['cover'])
+    return rows
+
+
+def _init_worker(config_file: str, pack: bool):
+    global _service
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    _service = SpotipiEinkDisplay.headless(config, logging.getLogger('batchRender'), panel=pack)
+
+
+def render_row(row: dict, out_dir: str, png: bool, pack: bool) -> tuple:
+    """Render one manifest row in a worker
+
+    Returns:
+        tuple: name, frame cache key or None, packed buffer or None, error or None
+    """
+    service = _service
+    try:
+        cover = None
+        if row.get('cover'):
+            with open(row['cover'], 'rb') as f:
+                # as stored by the service's cover cache
+                max_px = max(service.config.getint('DEFAULT', 'width'), service.config.getint('DEFAULT', 'height'))
+                cover = CoverCache.shrink(service._decode_cover(f.read()), max_px)
+        accent = None
+        if cover is not None and service.accent_color:
+            accent = dominant_color(cover, service.palette)
+        image = service._gen_pic(cover, artist=row.get('artist', ''), title=row.get('title', ''),
+                                 duration_ms=None, progress_ms=None, is_playing=True, accent=accent)
+        if png:
+            image.save(os.path.join(out_dir, row['name'] + '.png'))
+        buffer = None
+        if pack:
+            buffer = service.display.pack(image, saturation=service.saturation)
+            with open(os.path.join(out_dir, row['name'] + '.bin'), 'wb') as f:
+                f.write(buffer)
+        key = None
+        # the service does not keep frames with the placeholder either
+        if cover is not None and row.get('cover_url'):
+            key = service._frame_key([row.get('title', ''), row['cover_url'], row.get('artist', '')])
+        return row['name'], key, buffer, None
+    except Exception as e:
+        return row['name'], None, None, f'{type(e).__name__}: {e}'
+
+
+def positive_int(value: str) -> int:
+    """argparse type of counts that must be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'{value} is not at least 1')
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('manifest', help='JSON or CSV track list')
+    parser.add_argument('--out', required=True, help='directory for the PNGs and packed buffers')
+    parser.add_argument('--config', default=CONFIG_FILE, help='eink_options.ini to render with')
+    parser.add_argument('--frame-cache', action='store_true', help='store the packed frames in the frame cache')
+    parser.add_argument('--no-png', action='store_true', help='do not write PNGs')
+    parser.add_argument('--no-pack', action='store_true', help='do not pack panel buffers')
+    parser.add_argument('--workers', type=positive_int, default=os.cpu_count() or 1, help='render processes')
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s %(message)s', level=logging.INFO)
+    logger = logging.getLogger('batchRender')
+    if not os.path.exists(args.config):
+        parser.error(f'config file {args.config} not found')
+    if args.frame_cache and args.no_pack:
+        parser.error('--frame-cache needs the packed buffers')
+    rows = load_manifest(args.manifest)
+    os.makedirs(args.out, exist_ok=True)
+    # fail here with a clear message rather than with a broken pool in every worker
+    try:
+        _init_worker(args.config, not args.no_pack)
+        if not args.no_pack:
+            _service.display.pack(Image.new('RGB', (_service.config.getint('DEFAULT', 'width'), _service.config.getint('DEFAULT', 'height'))),
+                                  saturation=_service.saturation)
+    except Exception as e:
+        logger.error(f'Can not render with {args.config}: {type(e).__name__}: {e}'
+                     + ('' if args.no_pack else ', --no-pack writes the PNGs without the panel library'))
+        sys.exit(1)
+    frame_cache = None
+    if args.frame_cache:
+        config = configparser.ConfigParser()
+        config.read(args.config)
+        frame_cache = FrameCache(config.get('DEFAULT', 'frame_cache_dir', fallback=os.path.join(os.path.dirname(__file__), '..', 'cache', 'frames')),
+                                 max_bytes=config.getint('DEFAULT', 'frame_cache_mb', fallback=50) * 1024 * 1024,
+                                 logger=logger,
+                                 compress=config.getboolean('DEFAULT', 'frame_cache_compress', fallback=True))
+
+    start = time.perf_counter()
+    failed = cached = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args.config, not args.no_pack)) as pool:
+            results = pool.map(render_row, rows, [args.out] * len(rows), [not args.no_png] * len(rows),
+                               [not args.no_pack] * len(rows), chunksize=max(1, len(rows) // (4 * args.workers)))
+            for name, key, buffer, error in results:
+                if error:
+                    failed += 1
+                    logger.error(f'{name}: {error}')
+                elif frame_cache is not None and key is not None:
+                    # only this process writes the cache
+                    frame_cache.put(key, buffer)
+                    cached += 1
+    except BrokenProcessPool as e:
+        logger.error(f'A render worker died: {e}')
+        sys.exit(1)
+    seconds = time.perf_counter() - start
+    logger.info(f'Rendered {len(rows) - failed} of {len(rows)} tracks in {seconds:.1f}s '
+                f'({len(rows) / seconds:.1f}/s on {args.workers} workers), {cached} frames cached')
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
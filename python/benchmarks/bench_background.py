@@ -0,0 +1,50 @@
+"""Benchmark the blurred-background tiers against the exact pipeline.
+
+Usage: python benchmarks/bench_background.py [cover.jpg]
+
+Reports ms per background and the difference to the exact tier as mean
+absolute error (0-255) and PSNR in dB, at each panel resolution.
+"""
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from PIL import Image, ImageChops, ImageStat  # noqa: E402
+from backgroundEngine import TIERS, blurred_background  # noqa: E402
+
+SIZES = ((600, 448), (640, 400), (800, 480))
+DEFAULT_COVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'resources', 'default.jpg')
+
+
+def difference(a, b):
+    """Mean absolute error and PSNR between two RGB images"""
+    diff = ImageChops.difference(a, b)
+    mae = sum(ImageStat.Stat(diff).mean) / 3
+    mse = sum(ImageStat.Stat(diff).sum2) / (3 * a.width * a.height)
+    psnr = float('inf') if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+    return mae, psnr
+
+
+def time_ms(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best, result
+
+
+def main():
+    cover = Image.open(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_COVER).convert('RGB')
+    for size in SIZES:
+        exact_ms, exact = time_ms(lambda: blurred_background(cover, size, tier='exact'))
+        for tier in TIERS:
+            ms, bg = time_ms(lambda: blurred_background(cover, size, tier=tier))
+            mae, psnr = difference(exact, bg)
+            print(f'{size[0]}x{size[1]}  {tier:8}  {ms:7.1f} ms  x{exact_ms / ms:5.1f}  MAE {mae:5.2f}  PSNR {psnr:5.1f} dB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Benchmark the dithering algorithms for every panel palette.
+
+Usage: python benchmarks/bench_dither.py [cover.jpg]
+
+Reports ms per frame and a perceptual error: both the source and the
+dithered frame are blurred like the eye does at viewing distance and
+compared as mean absolute error (0-255) and PSNR in dB, in luminance only
+for the grayscale palettes.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from PIL import Image, ImageFilter, ImageOps  # noqa: E402
+from ditherEngine import ALGORITHMS, PALETTES, adjust, dither  # noqa: E402
+from bench_background import DEFAULT_COVER, SIZES, difference, time_ms  # noqa: E402
+
+# gaussian radius standing in for the eye's low-pass at viewing distance
+EYE_RADIUS = 1.5
+
+
+def perceptual_error(source, dithered, palette):
+    blur = ImageFilter.GaussianBlur(radius=EYE_RADIUS)
+    if palette != 'acep7':
+        # grayscale panels: compare luminance only, the lost chroma would swamp the dither error
+        source = source.convert('L').convert('RGB')
+    return difference(source.filter(blur), dithered.convert('RGB').filter(blur))
+
+
+def main():
+    cover = Image.open(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_COVER).convert('RGB')
+    for size in SIZES:
+        frame = ImageOps.fit(cover, size, method=Image.Resampling.LANCZOS)
+        for palette in PALETTES:
+            source = adjust(frame, saturation=2 if palette == 'acep7' else 1)
+            for algorithm in ALGORITHMS:
+                ms, out = time_ms(lambda: dither(source, palette=palette, algorithm=algorithm), repeat=3)
+                mae, psnr = perceptual_error(source, out, palette)
+                print(f'{size[0]}x{size[1]}  {palette:6} {algorithm:16} {ms:7.1f} ms  MAE {mae:5.2f}  PSNR {psnr:5.1f} dB')
+
+
+if __name__ == '__main__':
+    main()
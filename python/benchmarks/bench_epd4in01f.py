@@ -0,0 +1,55 @@
+"""Benchmark epd4in01f.EPD.getbuffer against the original per-pixel loop.
+
+Usage: python benchmarks/bench_epd4in01f.py
+"""
+import random
+import fake_epdconfig
+fake_epdconfig.install()
+
+from PIL import Image  # noqa: E402
+from lib import epd4in01f  # noqa: E402
+
+PALETTE = [(0, 0, 0), (255, 255, 255), (0, 255, 0), (0, 0, 255),
+           (255, 0, 0), (255, 255, 0), (255, 128, 0)]
+
+
+def reference_getbuffer(epd, image):
+    """The original pure Python packer, kept for comparison"""
+    buf = [0x00] * int(epd.width * epd.height / 2)
+    image_monocolor = image.convert('RGB')
+    imwidth, imheight = image_monocolor.size
+    pixels = image_monocolor.load()
+    portrait = not (imwidth == epd.width and imheight == epd.height)
+    for y in range(imheight):
+        for x in range(imwidth):
+            newx, newy = (y, epd.height - x - 1) if portrait else (x, y)
+            Add = int((newx + newy * epd.width) / 2)
+            Color = PALETTE.index(pixels[x, y]) if pixels[x, y] in PALETTE else 0
+            data_t = buf[Add] & (~(0xF0 >> ((newx % 2) * 4)))
+            buf[Add] = data_t | ((Color << 4) >> ((newx % 2) * 4))
+    return bytes(buf)
+
+
+def quantized_frame(width, height):
+    """A random 7-color palette image, like _convert_image_wave produces"""
+    rng = random.Random(0)
+    img = Image.new('P', (width, height))
+    img.putpalette([c for rgb in PALETTE for c in rgb] + [0, 0, 0] * 249)
+    img.putdata([rng.randrange(8) for _ in range(width * height)])
+    return img
+
+
+def main():
+    epd = epd4in01f.EPD()
+    for name, size in (('landscape', (epd.width, epd.height)), ('portrait', (epd.height, epd.width))):
+        for mode in ('P', 'RGB'):
+            frame = quantized_frame(*size).convert(mode)
+            ref_ms, ref = fake_epdconfig.timeit(reference_getbuffer, epd, frame, repeat=1)
+            new_ms, new = fake_epdconfig.timeit(epd.getbuffer, frame)
+            status = 'identical' if bytes(new) == ref else 'MISMATCH'
+            print(f'{name:9} {mode:3}  loop {ref_ms:8.1f} ms  numpy {new_ms:6.1f} ms  '
+                  f'x{ref_ms / new_ms:6.0f}  {status}')
+
+
+if __name__ == '__main__':
+    main()
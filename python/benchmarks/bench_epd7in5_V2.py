@@ -0,0 +1,141 @@
+"""Benchmark the epd7in5_V2 buffer paths against the original Python loops.
+
+Usage: python benchmarks/bench_epd7in5_V2.py
+"""
+import random
+import fake_epdconfig
+fake_epdconfig.install()
+
+from PIL import Image  # noqa: E402
+from lib import epd7in5_V2  # noqa: E402
+
+
+def reference_getbuffer_4Gray(epd, image):
+    """The original per-pixel 4-gray packer"""
+    buf = [0xFF] * (int(epd.width / 4) * epd.height)
+    image_monocolor = image.convert('L')
+    imwidth, imheight = image_monocolor.size
+    pixels = image_monocolor.load()
+    i = 0
+    if (imwidth == epd.width and imheight == epd.height):
+        for y in range(imheight):
+            for x in range(imwidth):
+                if (pixels[x, y] == 0xC0):
+                    pixels[x, y] = 0x80
+                elif (pixels[x, y] == 0x80):
+                    pixels[x, y] = 0x40
+                i = i+1
+                if (i % 4 == 0):
+                    buf[int((x + (y * epd.width))/4)] = ((pixels[x-3, y] & 0xc0) | (pixels[x-2, y] & 0xc0) >> 2 |
+                                                         (pixels[x-1, y] & 0xc0) >> 4 | (pixels[x, y] & 0xc0) >> 6)
+    else:
+        for x in range(imwidth):
+            for y in range(imheight):
+                newx = y
+                newy = epd.height - x - 1
+                if (pixels[x, y] == 0xC0):
+                    pixels[x, y] = 0x80
+                elif (pixels[x, y] == 0x80):
+                    pixels[x, y] = 0x40
+                i = i+1
+                if (i % 4 == 0):
+                    buf[int((newx + (newy * epd.width))/4)] = ((pixels[x, y-3] & 0xc0) | (pixels[x, y-2] & 0xc0) >> 2 |
+                                                               (pixels[x, y-1] & 0xc0) >> 4 | (pixels[x, y] & 0xc0) >> 6)
+    return bytes(buf)
+
+
+def reference_planes_4Gray(image):
+    """The 0x10 and 0x13 planes as the original display_4Gray built them"""
+    planes = []
+    for lut in ({0xC0: 0, 0x00: 1, 0x80: 1, 0x40: 0}, {0xC0: 0, 0x00: 1, 0x80: 0, 0x40: 1}):
+        plane = bytearray()
+        for i in range(len(image) // 2):
+            temp3 = 0
+            for j in range(0, 2):
+                temp1 = image[i*2+j]
+                for _ in range(0, 4):
+                    temp3 = (temp3 << 1) | lut[temp1 & 0xC0]
+                    temp1 <<= 2
+            plane.append(temp3)
+        planes.append(bytes(plane))
+    return planes
+
+
+def reference_getbuffer(image):
+    """The original 1-bit packer with its per-byte inversion loop"""
+    buf = bytearray(image.convert('1').tobytes('raw'))
+    for i in range(len(buf)):
+        buf[i] ^= 0xFF
+    return buf
+
+
+def reference_old_plane(epd, image, region):
+    """The 0x10/partial plane as the original display loops built it"""
+    image1 = [0xFF] * int(epd.width * epd.height / 8)
+    for i in range(region):
+        image1[i] = ~image[i] & 0xFF
+    return bytes(image1)
+
+
+def full_frame(epd, frame):
+    epd.display(epd.getbuffer(frame))
+
+
+def reference_full_frame(epd, frame):
+    buf = reference_getbuffer(frame)
+    return reference_old_plane(epd, buf, len(buf)), bytes(buf)
+
+
+def capture(func, *args):
+    """Run func with the fake SPI bus recording and return the transfers"""
+    fake_epdconfig.captured = []
+    try:
+        func(*args)
+        return fake_epdconfig.captured
+    finally:
+        fake_epdconfig.captured = None
+
+
+def gray_frame(width, height):
+    rng = random.Random(0)
+    img = Image.new('L', (width, height))
+    img.putdata([rng.choice((0x00, 0x80, 0xC0, 0xFF, rng.randrange(256))) for _ in range(width * height)])
+    return img
+
+
+def report(name, ref_ms, new_ms, identical):
+    status = 'identical' if identical else 'MISMATCH'
+    print(f'{name:28} loop {ref_ms:8.1f} ms  new {new_ms:6.2f} ms  x{ref_ms / new_ms:6.0f}  {status}')
+
+
+def main():
+    epd = epd7in5_V2.EPD()
+    for name, size in (('landscape', (epd.width, epd.height)), ('portrait', (epd.height, epd.width))):
+        frame = gray_frame(*size)
+        ref_ms, ref = fake_epdconfig.timeit(reference_getbuffer_4Gray, epd, frame.copy(), repeat=1)
+        new_ms, new = fake_epdconfig.timeit(epd.getbuffer_4Gray, frame)
+        report(f'getbuffer_4Gray {name}', ref_ms, new_ms, bytes(new) == ref)
+
+    buf = epd.getbuffer_4Gray(gray_frame(epd.width, epd.height))
+    ref_ms, ref = fake_epdconfig.timeit(reference_planes_4Gray, buf, repeat=1)
+    new_ms, _ = fake_epdconfig.timeit(epd.display_4Gray, buf)
+    planes = [data for data in capture(epd.display_4Gray, buf) if len(data) > 1]
+    report('display_4Gray', ref_ms, new_ms, planes == ref)
+
+    frame = gray_frame(epd.width, epd.height)
+    ref_ms, ref = fake_epdconfig.timeit(reference_full_frame, epd, frame, repeat=1)
+    new_ms, _ = fake_epdconfig.timeit(full_frame, epd, frame)
+    planes = [data for data in capture(full_frame, epd, frame) if len(data) > 1]
+    report('full frame (1-bit)', ref_ms, new_ms, planes == list(ref))
+
+    buf = epd.getbuffer(frame)
+    window = (0, 0, 400, 240)
+    region = (window[2] - window[0]) // 8 * (window[3] - window[1])
+    ref_ms, ref = fake_epdconfig.timeit(reference_old_plane, epd, buf, region, repeat=1)
+    new_ms, _ = fake_epdconfig.timeit(epd.display_Partial, buf, *window)
+    planes = [data for data in capture(epd.display_Partial, buf, *window) if len(data) > 1]
+    report('partial frame (400x240)', ref_ms, new_ms, planes == [ref])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""Hardware-free benchmark of the whole render and panel pipeline.
+
+Usage: python benchmarks/bench_suite.py [--out run.json] [--baseline base.json]
+                                        [--save-baseline base.json] [--threshold 0.2]
+
+Every stage is timed at each panel size, in playing and idle mode, with and
+without a cover. The panel drivers run on fake_epdconfig and fake_inky, so
+the upload stages report the SPI bytes, GPIO activity and busy waits they
+would cause:
+
+  600x448  Inky Impression   (inky set_image/pack, show)
+  640x400  Waveshare 4.01"   (epd4in01f getbuffer, display)
+  800x480  Waveshare 7.5" V2 (epd7in5_V2 4-gray getbuffer, display_4Gray)
+
+Results are printed and written as JSON. Against a baseline a stage is
+flagged when it got threshold slower (and at least 1ms) or when its SPI/GPIO
+counts changed; the exit code is 1 if anything was flagged. Times depend on
+the machine, record the baseline on the box you compare on.
+"""
+import argparse
+import configparser
+import io
+import json
+import logging
+import platform
+import sys
+
+import fake_epdconfig
+import fake_inky
+fake_epdconfig.install()
+fake_inky.install()
+
+import numpy as np  # noqa: E402
+import PIL  # noqa: E402
+from PIL import Image  # noqa: E402
+from lib import epd4in01f, epd7in5_V2  # noqa: E402
+import ditherEngine  # noqa: E402
+from accentCache import dominant_color  # noqa: E402
+from spotipiEinkDisplay import SpotipiEinkDisplay  # noqa: E402
+from bench_background import DEFAULT_COVER  # noqa: E402
+
+# panel size -> model the service renders for
+PANELS = {(600, 448): 'inky', (640, 400): 'waveshare4', (800, 480): 'waveshare7'}
+TITLE = 'A Fairly Long Song Title That Needs Wrapping'
+ARTIST = 'Some Artist, Another Artist'
+# per stage counters compared exactly against the baseline
+COUNTERS = ('spi_bytes', 'spi_transfers', 'gpio_writes', 'gpio_reads', 'busy_waits')
+
+
+def make_service(size, model):
+    config = configparser.ConfigParser()
+    config.read_dict({'DEFAULT': {'width': size[0], 'height': size[1],
+                                  # the 7.5" panel is not wired into the service, render as for the 4" one
+                                  'model': 'waveshare4' if model == 'waveshare7' else model}})
+    return SpotipiEinkDisplay.headless(config, logging.getLogger('bench'))
+
+
+def decode_cover(data, px):
+    """What _get_cover does with a downloaded cover"""
+    cover = Image.open(io.BytesIO(data))
+    cover.draft('RGB', (px, px))
+    return cover.convert('RGB')
+
+
+def upload_counters():
+    return {'spi_bytes': fake_epdconfig.spi_bytes + fake_inky.shown_bytes,
+            'spi_transfers': fake_epdconfig.spi_transfers + fake_inky.shows,
+            'gpio_writes': fake_epdconfig.gpio_writes,
+            'gpio_reads': fake_epdconfig.gpio_reads,
+            'busy_waits': fake_epdconfig.busy_waits}
+
+
+def run_case(size, mode, cover_data, repeat):
+    """Time every stage of one case, returns stage -> result dict"""
+    model = PANELS[size]
+    service = make_service(size, model)
+    stages = {}
+
+    def stage(name, func, *args):
+        fake_epdconfig.reset_counters()
+        fake_inky.reset_counters()
+        ms, result = fake_epdconfig.timeit(func, *args, repeat=repeat)
+        stages[name] = {'ms': round(ms, 3)}
+        if name == 'upload':
+            # counters of a single run
+            stages[name].update({k: v // repeat for k, v in upload_counters().items()})
+        return result
+
+    cover = None
+    accent = None
+    if cover_data is not None:
+        cover = stage('cover_decode', decode_cover, cover_data, service._cover_px_needed())
+        if mode == 'playing':
+            accent = stage('accent', dominant_color, cover, service.palette)
+    image = stage('gen_pic', service._gen_pic, cover, ARTIST, TITLE, None, None, mode == 'playing', accent)
+
+    if model == 'inky':
+        def show(buffer):
+            # show() skips identical frames, forget the digest between repeats
+            service.display.frame_digest = None
+            return service.display.show(buffer)
+        buffer = stage('pack', service.display.pack, image, service.saturation)
+        stage('upload', show, buffer)
+    elif model == 'waveshare4':
+        epd = epd4in01f.EPD()
+        converted = stage('convert', service._convert_image_wave, image)
+        buffer = stage('pack', epd.getbuffer, converted)
+        stage('upload', epd.display, buffer)
+    else:
+        epd = epd7in5_V2.EPD()
+        converted = stage('convert', ditherEngine.dither, image, 'gray4')
+        buffer = stage('pack', epd.getbuffer_4Gray, converted)
+        stage('upload', epd.display_4Gray, buffer)
+    stages['total'] = {'ms': round(sum(s['ms'] for s in stages.values()), 3)}
+    return stages
+
+
+def compare(results, baseline, threshold):
+    """Return a list of regression messages"""
+    flagged = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if result['ms'] > base['ms'] * (1 + threshold) and result['ms'] - base['ms'] >= 1:
+            flagged.append(f'{key}: {base["ms"]:.1f}ms -> {result["ms"]:.1f}ms')
+        for counter in COUNTERS:
+            if counter in base and result.get(counter) != base[counter]:
+                flagged.append(f'{key}: {counter} {base[counter]} -> {result.get(counter)}')
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cover', default=DEFAULT_COVER, help='JPEG cover used for the cover cases')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage, the best counts')
+    parser.add_argument('--out', help='write the results JSON here')
+    parser.add_argument('--baseline', help='compare against this results JSON')
+    parser.add_argument('--save-baseline', help='also write the results as new baseline here')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative slow-down that is flagged')
+    args = parser.parse_args()
+
+    with open(args.cover, 'rb') as f:
+        cover_data = f.read()
+    # the Waveshare driver's prints would drown the report
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = {}
+    for size in PANELS:
+        for mode in ('playing', 'idle'):
+            for with_cover in (True, False):
+                case = f'{size[0]}x{size[1]}/{mode}/{"cover" if with_cover else "no_cover"}'
+                for name, result in run_case(size, mode, cover_data if with_cover else None, args.repeat).items():
+                    results[f'{case}/{name}'] = result
+                    extra = ''.join(f'  {k} {result[k]}' for k in COUNTERS if k in result)
+                    print(f'{case:28} {name:13} {result["ms"]:8.1f} ms{extra}')
+
+    report = {'meta': {'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'numpy': np.__version__,
+                       'pillow': PIL.__version__,
+                       'repeat': args.repeat},
+              'results': results}
+    for path in (args.out, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=1, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            flagged = compare(results, json.load(f)['results'], args.threshold)
+        for message in flagged:
+            print(f'REGRESSION {message}')
+        if flagged:
+            sys.exit(1)
+        print('No regressions against the baseline')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Check the httpPool session against the local stub server.
+
+Usage: python benchmarks/check_http.py
+
+Verifies that a hung peer is cut off by the read timeout, that 5xx
+responses are retried, that a 429 reaches the caller with its Retry-After
+header instead of being retried, and that latencies are recorded per host.
+Exits with 1 if a check fails.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import requests  # noqa: E402
+import httpPool  # noqa: E402
+from stub_http_server import StubHTTPServer  # noqa: E402
+
+
+def main():
+    failed = []
+
+    def check(name, ok, detail=''):
+        print(f'{"PASS" if ok else "FAIL"} {name} {detail}')
+        if not ok:
+            failed.append(name)
+
+    with StubHTTPServer() as server:
+        server.add('/hung', body=b'late', delay=2)
+        server.add('/flaky', status=503)
+        server.add('/limited', status=429, headers={'Retry-After': '3'})
+        server.add('/image', body=b'\xff\xd8' + bytes(1000), content_type='image/jpeg')
+
+        session = httpPool.make_session(timeout=(1, 0.3), retries=0)
+        start = time.perf_counter()
+        try:
+            session.get(server.url('/hung'))
+            check('read timeout', False, 'the hung request returned')
+        except requests.ConnectionError as e:
+            seconds = time.perf_counter() - start
+            check('read timeout', seconds < 1.5, f'{type(e).__name__} after {seconds:.2f}s')
+
+        session = httpPool.make_session(timeout=(1, 1), retries=2, backoff_factor=0, backoff_jitter=0)
+        before = len(server.requests)
+        resp = session.get(server.url('/flaky'))
+        attempts = len(server.requests) - before
+        check('5xx retried', resp.status_code == 503 and attempts == 3, f'{attempts} attempts')
+
+        before = len(server.requests)
+        resp = session.get(server.url('/limited'))
+        attempts = len(server.requests) - before
+        check('429 passed through', resp.status_code == 429 and attempts == 1 and resp.headers.get('Retry-After') == '3',
+              f'{attempts} attempts, Retry-After {resp.headers.get("Retry-After")}')
+
+        for _ in range(3):
+            session.get(server.url('/image')).raise_for_status()
+        stats = session.latency_stats()
+        host = server.url('').split('//')[1]
+        check('latency recorded', stats.get(host, {}).get('count') == 5, str(stats.get(host)))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
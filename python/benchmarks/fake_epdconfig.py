@@ -0,0 +1,128 @@
+"""Hardware-free stand-in for lib/epdconfig used by the benchmarks.
+
+Call install() before importing any of the lib.epd* drivers so they bind to
+this module instead of probing for a Raspberry Pi.
+"""
+import os
+import sys
+import time
+
+RST_PIN = 17
+DC_PIN = 25
+CS_PIN = 8
+BUSY_PIN = 24
+PWR_PIN = 18
+
+# everything that would have gone over the SPI bus
+spi_bytes = 0
+spi_transfers = 0
+# set to a list to also keep a copy of every transfer
+captured = None
+# GPIO activity: pin writes and busy line reads
+gpio_writes = 0
+gpio_reads = 0
+# busy phases the drivers waited for
+busy_waits = 0
+
+
+class _FakeSpiDev:
+    def writebytes(self, data):
+        _record(data)
+
+    def writebytes2(self, data):
+        _record(data)
+
+
+SPI = _FakeSpiDev()
+
+
+def _record(data):
+    global spi_bytes, spi_transfers
+    spi_bytes += len(data)
+    spi_transfers += 1
+    if captured is not None:
+        captured.append(bytes(data))
+
+
+def reset_counters():
+    global spi_bytes, spi_transfers, gpio_writes, gpio_reads, busy_waits, _busy_level
+    _busy_level = 0
+    busy_waits = 0
+    spi_bytes = 0
+    spi_transfers = 0
+    gpio_writes = 0
+    gpio_reads = 0
+
+
+def digital_write(pin, value):
+    global gpio_writes
+    gpio_writes += 1
+
+
+_busy_level = 0
+
+
+def digital_read(pin):
+    # toggle on every read so busy loops of either polarity finish at once
+    global _busy_level, gpio_reads
+    gpio_reads += 1
+    _busy_level ^= 1
+    return _busy_level
+
+
+def delay_ms(delaytime):
+    pass
+
+
+def wait_busy(pin, level, timeout_s=60):
+    # the fake panel is never busy
+    global busy_waits
+    busy_waits += 1
+    return True
+
+
+def busy_stats():
+    return {'phases': busy_waits, 'timeouts': 0, 'total_seconds': 0.0}
+
+
+def spi_writebyte(data):
+    _record(data)
+
+
+def spi_writebyte2(data):
+    _record(data)
+
+
+def spi_stats():
+    return {'transfers': spi_transfers, 'total_bytes': spi_bytes, 'total_seconds': 0.0}
+
+
+def gpio_stats():
+    return {'writes': gpio_writes, 'reads': gpio_reads}
+
+
+def module_init():
+    return 0
+
+
+def module_exit():
+    pass
+
+
+def install():
+    """Register this module as lib.epdconfig and make lib importable"""
+    python_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    if python_dir not in sys.path:
+        sys.path.insert(0, python_dir)
+    sys.modules['lib.epdconfig'] = sys.modules[__name__]
+
+
+def timeit(func, *args, repeat=5):
+    """Return the best wall time of func(*args) in ms and its last result"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best, result
@@ -0,0 +1,57 @@
+"""Hardware-free stand-in for the Pimoroni inky library used by the benchmarks.
+
+Call install() before anything imports inky. The fake Impression keeps the
+4bpp palette buffer like the real one and counts what show() would send.
+"""
+import sys
+import types
+import numpy as np
+
+WIDTH = 600
+HEIGHT = 448
+CLEAN = 7
+
+# bytes show() would have sent to the panel
+shown_bytes = 0
+shows = 0
+
+
+class FakeInky:
+    def __init__(self, resolution=(WIDTH, HEIGHT)):
+        self.width, self.height = resolution
+        self.buf = np.zeros((self.height, self.width), dtype=np.uint8)
+
+    def set_image(self, image, saturation=0.5):
+        # the real driver blends its palettes by saturation and lets Pillow dither, which costs the same
+        import ditherEngine
+        if image.mode != 'P':
+            image = ditherEngine.dither(image, palette='acep7', algorithm='pil')
+        self.buf = np.asarray(image, dtype=np.uint8).reshape((self.height, self.width))
+
+    def show(self):
+        global shown_bytes, shows
+        shown_bytes += self.buf.size // 2
+        shows += 1
+
+
+def auto():
+    return FakeInky()
+
+
+def reset_counters():
+    global shown_bytes, shows
+    shown_bytes = 0
+    shows = 0
+
+
+def install():
+    """Register this module as inky, inky.auto and inky.inky_uc8159"""
+    package = types.ModuleType('inky')
+    package.auto = types.ModuleType('inky.auto')
+    package.auto.auto = auto
+    package.inky_uc8159 = types.ModuleType('inky.inky_uc8159')
+    package.inky_uc8159.CLEAN = CLEAN
+    package.inky_uc8159.Inky = FakeInky
+    sys.modules['inky'] = package
+    sys.modules['inky.auto'] = package.auto
+    sys.modules['inky.inky_uc8159'] = package.inky_uc8159
@@ -0,0 +1,70 @@
+"""Local HTTP server standing in for Spotify and its image CDN.
+
+    with StubHTTPServer() as server:
+        server.add('/image/abc', body=jpeg_bytes, content_type='image/jpeg')
+        server.add('/v1/me/player/currently-playing', status=429, headers={'Retry-After': '3'})
+        session.get(server.url('/image/abc'))
+
+Routes can also delay their answer to simulate a slow or hung peer.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self):
+        route = self.server.routes.get(self.path.split('?')[0])
+        self.server.requests.append((self.command, self.path))
+        if route is None:
+            route = {'status': 404, 'body': b'', 'headers': {}, 'content_type': 'text/plain', 'delay': 0}
+        if route['delay']:
+            time.sleep(route['delay'])
+        try:
+            self.send_response(route['status'])
+            self.send_header('Content-Type', route['content_type'])
+            self.send_header('Content-Length', str(len(route['body'])))
+            for name, value in route['headers'].items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(route['body'])
+        except (BrokenPipeError, ConnectionResetError):
+            # the client timed out while we were delaying
+            pass
+
+    do_GET = do_POST = do_PUT = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubHTTPServer:
+    def __init__(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.routes = {}
+        self._server.requests = []
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def requests(self):
+        """(method, path) of every request received"""
+        return self._server.requests
+
+    def add(self, path, body=b'', status=200, headers=None, content_type='application/octet-stream', delay=0):
+        self._server.routes[path] = {'status': status, 'body': body, 'headers': headers or {},
+                                     'content_type': content_type, 'delay': delay}
+
+    def url(self, path):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}{path}'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -1,8 +1,13 @@
 import sys
 import os
 import configparser
+import logging
 import signal
 import RPi.GPIO as GPIO
+import httpPool
+import eventChannel
+import tokenBroker
+import commandQueue
 
 # some global stuff.
 # initial status
@@ -28,50 +33,69 @@ def get_state(current_state: str) -> str:
         return states[0]
 
 
-# "handle_button" will be called every time a button is pressed
-# It receives one argument: the associated input pin.
-def handle_button(pin):
-    global current_state
-    global config
-    # do this every time to load the latest refresh token from the displayCoverArt.py->getSongInfo.py
-    # use the shared client
-    global sp
-    label = LABELS[BUTTONS.index(pin)]
+# last known playback state, play/pause toggles from it without asking Spotify first
+is_playing = None
+
 
+def run_command(command):
+    """Executes a coalesced button command on the command queue worker
+
+    Args:
+        command (commandQueue.Command): skip with the net number of tracks or toggle
+    """
+    global is_playing
+    skipped = 0
     try:
-        if label == 'A':
-            sp.next_track()
-        elif label == 'B':
-            sp.previous_track()
-        elif label == 'C':
-            playback = sp.currently_playing(additional_types='episode')
-            if playback and playback.get('is_playing', False):
+        if command.kind == 'skip':
+            direction = 'next' if command.count > 0 else 'previous'
+            # count only keeps the skips still to do, so a retry never repeats an acknowledged one
+            while command.count != 0:
+                if command.count > 0:
+                    sp.next_track()
+                    command.count -= 1
+                else:
+                    sp.previous_track()
+                    command.count += 1
+                skipped += 1
+            eventChannel.send_event(event_socket, 'skipped', direction=direction, tracks=skipped)
+        elif command.kind == 'toggle':
+            if is_playing is None:
+                playback = sp.currently_playing(additional_types='episode')
+                is_playing = bool(playback and playback.get('is_playing', False))
+            if is_playing:
                 sp.pause_playback()
             else:
                 sp.start_playback()
-        elif label == 'D':
-            try:
-                playback = sp.currently_playing(additional_types='episode')
-            except Exception:
-                playback = None
-            if not playback or not playback.get('is_playing', False):
-                open('/home/stavri/spotipi-eink/python/spotipi_cycle_idle','w').close()
-        return
-
+            is_playing = not is_playing
+            eventChannel.send_event(event_socket, 'paused', playing=is_playing)
     except Exception as e:
-        # fallback to cache-file auth with no prompts
-        import spotipy
-        import spotipy.util as util
-        token = util.prompt_for_user_token(
-            username=config['DEFAULT']['username'],
-            scope='user-read-currently-playing,user-modify-playback-state',
-            cache_path=config['DEFAULT']['token_file']
-        )
-        if token:
-            sp = spotipy.Spotify(auth=token)
-            # retry this same button action once
-            handle_button(pin)
-        # if token is still None, we silently give up
+        status = getattr(e, 'http_status', None)
+        if status == 401:
+            # token rejected, take a fresh one from the broker on the retry
+            sp.auth_manager.invalidate()
+        elif status == 403 and command.kind == 'toggle':
+            # the state changed elsewhere (e.g. the phone), ask Spotify on the retry
+            is_playing = None
+        if skipped:
+            # the tracks that did skip still change what plays
+            eventChannel.send_event(event_socket, 'skipped', direction=direction, tracks=skipped)
+        raise
+
+
+# "handle_button" will be called every time a button is pressed
+# It receives one argument: the associated input pin.
+# It only queues the command so the GPIO thread never waits for Spotify.
+def handle_button(pin):
+    label = LABELS[BUTTONS.index(pin)]
+    if label == 'A':
+        commands.submit('skip', 1)
+    elif label == 'B':
+        commands.submit('skip', -1)
+    elif label == 'C':
+        commands.submit('toggle')
+    elif label == 'D':
+        # the display only cycles the idle image while nothing plays
+        eventChannel.send_event(event_socket, 'cycle_idle')
 
 
 # CTR + C event clean up GPIO setup and exit nicly
@@ -88,16 +112,32 @@ def main():
     import configparser
 
     global sp
+    global http
+    global event_socket
+    global commands
     cfg = configparser.ConfigParser()
     cfg.read(os.path.join(os.path.dirname(__file__),
                           '..', 'config', 'eink_options.ini'))
+    # command latencies and retries go to the journal
+    logging.basicConfig(format='%(asctime)s %(message)s', level=logging.INFO)
+    # keep-alive session with timeouts shared by all button presses
+    http = httpPool.session_from_config(cfg)
+    # button events wake the display service right away
+    event_socket = eventChannel.socket_from_config(cfg)
     scope = 'user-read-currently-playing,user-modify-playback-state'
     auth = SpotifyOAuth(
         scope=scope,
         cache_path=cfg['DEFAULT']['token_file'],
-        open_browser=False
+        open_browser=False,
+        requests_session=http
     )
-    sp = spotipy.Spotify(auth_manager=auth)
+    # the display service refreshes the token, the own oauth manager is only used while it is down
+    broker = tokenBroker.BrokerClient(tokenBroker.socket_from_config(cfg), auth, logging.getLogger(__name__))
+    sp = spotipy.Spotify(auth_manager=broker, requests_session=http)
+    # presses are queued, coalesced and sent by one worker thread
+    commands = commandQueue.CommandQueue(run_command,
+                                         logging.getLogger(__name__),
+                                         retries=cfg.getint('DEFAULT', 'button_retries', fallback=3))
 
     # now your GPIO setup
     GPIO.setmode(GPIO.BCM)
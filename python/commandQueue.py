@@ -0,0 +1,94 @@
+import collections
+import threading
+import time
+
+
+class Command:
+    """A pending button command, count is the net number of presses still to execute"""
+
+    def __init__(self, kind: str, count: int = 1):
+        self.kind = kind
+        self.count = count
+        # time of the first press folded into this command
+        self.pressed_at = time.monotonic()
+        self.presses = 1
+
+    def __repr__(self):
+        return f'{self.kind}({self.count:+d})'
+
+
+class CommandQueue:
+    """Bounded queue between the GPIO callbacks and a worker thread.
+
+    submit() never blocks the GPIO thread. A press is folded into the
+    newest pending command of the same kind: skips add up (next +1,
+    previous -1) and two play/pause toggles cancel out, so a burst of
+    presses costs one API round trip per net operation. The worker retries
+    failed commands with exponential back-off. execute counts a command down
+    as its calls succeed, so a retry only repeats what did not happen yet.
+    """
+
+    def __init__(self, execute, logger, maxsize: int = 8, retries: int = 3, backoff: float = 0.5):
+        """
+        Args:
+            execute (callable): Command -> None, raises on failure
+            logger: service logger
+            maxsize (int, optional): pending commands kept, newer presses are dropped
+            retries (int, optional): retries of a failed command
+            backoff (float, optional): first retry delay in seconds, doubled each retry
+        """
+        self.execute = execute
+        self.logger = logger
+        self.maxsize = maxsize
+        self.retries = retries
+        self.backoff = backoff
+        self.dropped = 0
+        self._pending = collections.deque()
+        self._cond = threading.Condition()
+        self._worker = threading.Thread(target=self._run, name='button-commands', daemon=True)
+        self._worker.start()
+
+    def submit(self, kind: str, count: int = 1):
+        """Queue a press, coalescing it with the newest pending command of the same kind"""
+        with self._cond:
+            if self._pending and self._pending[-1].kind == kind:
+                last = self._pending[-1]
+                last.count = (last.count + count) % 2 if kind == 'toggle' else last.count + count
+                last.presses += 1
+                if last.count == 0:
+                    # the presses cancel out
+                    self._pending.pop()
+                    self.logger.info(f'{last.presses} {kind} presses cancel out')
+                return
+            if len(self._pending) >= self.maxsize:
+                self.dropped += 1
+                self.logger.warning(f'Command queue full, dropping {kind}')
+                return
+            self._pending.append(Command(kind, count))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                command = self._pending.popleft()
+            # execute may count the command down as parts of it succeed
+            label = repr(command)
+            for attempt in range(self.retries + 1):
+                try:
+                    self.execute(command)
+                except Exception as e:
+                    if attempt == self.retries:
+                        self.logger.error(f'Giving up on {label} ({command} left) after {attempt + 1} attempts: {e}')
+                        break
+                    delay = self.backoff * 2 ** attempt
+                    retry_after = (getattr(e, 'headers', None) or {}).get('Retry-After')
+                    if retry_after:
+                        delay = max(delay, float(retry_after))
+                    self.logger.warning(f'{label} failed with {command} left ({e}), retrying in {delay:.1f}s')
+                    time.sleep(delay)
+                else:
+                    latency_ms = (time.monotonic() - command.pressed_at) * 1000
+                    self.logger.info(f'{label} from {command.presses} presses acknowledged after {latency_ms:.0f}ms')
+                    break
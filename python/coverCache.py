@@ -0,0 +1,57 @@
+import io
+from PIL import Image
+from typing import Optional
+from diskCache import DiskCache
+
+
+class CoverCache(DiskCache):
+    """On-disk cache of decoded and resized album covers keyed by cover URL.
+
+    Covers are stored as PPM, so loading one is a plain read without
+    decompression.
+    """
+
+    SUFFIX = '.ppm'
+
+    def __init__(self, cache_dir: str, max_bytes: int, max_px: int, logger):
+        """
+        Args:
+            cache_dir (str): directory holding the cached covers
+            max_bytes (int): byte budget of the cache directory
+            max_px (int): covers larger than this are scaled down before storing
+            logger: service logger
+        """
+        super().__init__(cache_dir, max_bytes, logger)
+        self.max_px = max_px
+
+    def get(self, key: str, peek: bool = False) -> Optional[Image.Image]:
+        """Return the cached cover for key or None, see DiskCache.get_bytes for peek"""
+        data = self.get_bytes(key, peek=peek)
+        if data is None:
+            return None
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                return img.convert('RGB')
+        except (OSError, ValueError) as e:
+            self.logger.warning(f'Dropping unreadable cached cover: {e}')
+            self.drop(key)
+            if not peek:
+                self.hits -= 1
+                self.misses += 1
+            return None
+
+    @staticmethod
+    def shrink(cover: Image.Image, max_px: int) -> Image.Image:
+        """RGB copy of the cover scaled down to max_px, as it is stored"""
+        cover = cover.convert('RGB')
+        if max(cover.size) > max_px:
+            cover.thumbnail((max_px, max_px), Image.Resampling.LANCZOS)
+        return cover
+
+    def put(self, key: str, cover: Image.Image) -> Image.Image:
+        """Resize the cover, store it under key and return the stored image"""
+        cover = self.shrink(cover, self.max_px)
+        data = io.BytesIO()
+        cover.save(data, format='PPM')
+        self.put_bytes(key, data.getvalue())
+        return cover
@@ -0,0 +1,189 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from typing import Optional
+
+
+class DiskCache:
+    """Size-bounded key/value store of byte blobs on local disk.
+
+    Entries are files named after a hash of their key. The file mtime
+    doubles as the LRU timestamp, which keeps the eviction order across
+    restarts. Files are written to a temporary name and renamed into place,
+    so a power cut leaves either the old state or the complete entry.
+
+    Another process may share the directory (batchRender.py fills the frame
+    cache while the service runs): a lookup missing the index checks the
+    disk and adopts the file, and a write rescans the directory once the
+    other process changed it, so both keep to the same byte budget. Only
+    stale temporary files are removed, the other process may be writing.
+    """
+
+    SUFFIX = '.bin'
+    # a temporary file this old is left over from an interrupted write, not in flight
+    STALE_TMP_S = 3600
+
+    def __init__(self, cache_dir: str, max_bytes: int, logger):
+        """
+        Args:
+            cache_dir (str): directory holding the cache files
+            max_bytes (int): byte budget of the cache directory
+            logger: service logger
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.logger = logger
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        # file name -> [size, last use], rebuilt from the directory on start
+        self._index = {}
+        self._size = 0
+        self._dir_mtime = None
+        self._scan(remove_stale=True)
+
+    def _name(self, key: str) -> str:
+        return hashlib.sha1(key.encode('utf-8')).hexdigest() + self.SUFFIX
+
+    def _scan(self, remove_stale: bool = False):
+        """Rebuild the index from the directory"""
+        self._dir_mtime = os.stat(self.cache_dir).st_mtime_ns
+        index = {}
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.name.endswith(self.SUFFIX):
+                        stat = entry.stat()
+                        index[entry.name] = [stat.st_size, stat.st_mtime]
+                    elif remove_stale and entry.name.endswith('.tmp') and time.time() - entry.stat().st_mtime > self.STALE_TMP_S:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    # removed by the other process meanwhile
+                    pass
+        self._index = index
+        self._size = sum(size for size, _ in index.values())
+
+    def _dir_changed(self) -> bool:
+        """True if another process changed the directory since the index was synced"""
+        try:
+            return os.stat(self.cache_dir).st_mtime_ns != self._dir_mtime
+        except OSError:
+            return True
+
+    def _synced(self):
+        """Mark the changes of this process as known"""
+        try:
+            self._dir_mtime = os.stat(self.cache_dir).st_mtime_ns
+        except OSError:
+            pass
+
+    def _adopt(self, name: str) -> bool:
+        """Index an entry another process wrote, call with the lock held"""
+        if name in self._index:
+            return True
+        try:
+            stat = os.stat(os.path.join(self.cache_dir, name))
+        except OSError:
+            return False
+        self._index[name] = [stat.st_size, stat.st_mtime]
+        self._size += stat.st_size
+        return True
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._adopt(self._name(key))
+
+    def entry_size(self, key: str) -> Optional[int]:
+        """Bytes the entry stored under key takes on disk, None if there is none"""
+        name = self._name(key)
+        with self._lock:
+            return self._index[name][0] if self._adopt(name) else None
+
+    def get_bytes(self, key: str, peek: bool = False) -> Optional[bytes]:
+        """Return the blob stored under key or None
+
+        peek=True neither counts a hit or miss nor marks the entry as used,
+        for background lookups that should not skew the statistics or the LRU.
+        """
+        name = self._name(key)
+        path = os.path.join(self.cache_dir, name)
+        with self._lock:
+            if not self._adopt(name):
+                self.misses += not peek
+                return None
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                if not peek:
+                    os.utime(path)
+                    self._index[name][1] = os.path.getmtime(path)
+            except FileNotFoundError:
+                # evicted by the other process
+                self._drop(name)
+                self.misses += not peek
+                return None
+            except OSError as e:
+                self.logger.warning(f'Dropping unreadable cache entry {name}: {e}')
+                self._drop(name)
+                self.misses += not peek
+                return None
+            self.hits += not peek
+            return data
+
+    def put_bytes(self, key: str, data: bytes) -> bool:
+        """Store data under key, returns False if it could not be written"""
+        name = self._name(key)
+        with self._lock:
+            if self._dir_changed():
+                # entries of the other process count against the budget too
+                self._scan()
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                path = os.path.join(self.cache_dir, name)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                self.logger.warning(f'Could not write cache entry: {e}')
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return False
+            if name in self._index:
+                self._size -= self._index[name][0]
+            stat = os.stat(path)
+            self._index[name] = [stat.st_size, stat.st_mtime]
+            self._size += stat.st_size
+            self._evict()
+            self._synced()
+        return True
+
+    def drop(self, key: str):
+        """Forget the entry stored under key"""
+        with self._lock:
+            if self._name(key) in self._index:
+                self._drop(self._name(key))
+
+    def _drop(self, name: str):
+        size, _ = self._index.pop(name)
+        self._size -= size
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits its budget"""
+        if self._size <= self.max_bytes:
+            return
+        for name, _ in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self._size <= self.max_bytes:
+                break
+            self._drop(name)
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._index), 'bytes': self._size}
@@ -0,0 +1,220 @@
+import hashlib
+import os
+import threading
+import time
+import numpy as np
+from PIL import Image
+from typing import Optional
+
+
+class DisplaySession:
+    """Long-lived owner of the panel driver.
+
+    The driver is initialised on the first refresh and stays awake between
+    refreshes, so GPIO/SPI setup, the reset pulses and the register sequence
+    are only paid again after the panel went to deep sleep. Deep sleep is
+    entered once no refresh happened for idle_sleep_s seconds. Both panels
+    switch their drive voltage off at the end of every refresh, only the
+    controller is kept powered while the session is awake.
+
+    The session also remembers a digest of the buffer on the glass and skips
+    refreshes that would show the exact same frame again. The digest is
+    written to digest_file so it survives a service restart.
+    """
+
+    def __init__(self, model: str, logger, idle_sleep_s: float = 120, convert=None, digest_file: Optional[str] = None,
+                 resolution: Optional[tuple] = None):
+        """
+        Args:
+            model (str): display model from eink_options.ini (inky or waveshare4)
+            logger: service logger
+            idle_sleep_s (float): seconds without refresh before deep sleep
+            convert (callable, optional): Image -> 7 color palette image for the Waveshare panel
+            digest_file (str, optional): where to persist the digest of the shown frame
+            resolution (tuple, optional): inky panel size, skips the EEPROM probe of inky.auto so frames can be packed without a panel
+        """
+        self.model = model
+        self.logger = logger
+        self.idle_sleep_s = idle_sleep_s
+        self.convert = convert
+        self.digest_file = digest_file
+        self.resolution = resolution
+        self.frame_digest = self._load_digest()
+        self.refreshes = 0
+        self.skipped_refreshes = 0
+        # stage -> seconds of the last show(): wake, spi_upload, panel_busy
+        self.last_timings = {}
+        self.awake = False
+        self._driver = None
+        self._lock = threading.RLock()
+        self._sleep_timer = None
+        if model == 'inky':
+            from inky.auto import auto
+            from inky.inky_uc8159 import CLEAN, Inky
+            self._inky_auto = auto
+            self._inky = Inky
+            self._inky_clean = CLEAN
+            self.logger.info('Loading Pimoroni inky lib')
+        if model == 'waveshare4':
+            from lib import epd4in01f
+            self._wave4 = epd4in01f
+            self.logger.info('Loading Waveshare 4" lib')
+
+    def _get_driver(self):
+        if self._driver is None:
+            if self.model == 'inky':
+                self._driver = self._inky(resolution=self.resolution) if self.resolution else self._inky_auto()
+            elif self.model == 'waveshare4':
+                self._driver = self._wave4.EPD()
+        return self._driver
+
+    def _wake(self):
+        """Return the driver, initialising the panel if it is asleep"""
+        driver = self._get_driver()
+        if self.model == 'waveshare4' and not self.awake:
+            driver.init()
+        self.awake = True
+        return driver
+
+    def _load_digest(self) -> Optional[str]:
+        if not self.digest_file:
+            return None
+        try:
+            with open(self.digest_file) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _store_digest(self, digest: Optional[str]):
+        self.frame_digest = digest
+        if not self.digest_file:
+            return
+        try:
+            if digest is None:
+                if os.path.exists(self.digest_file):
+                    os.remove(self.digest_file)
+                return
+            tmp_file = self.digest_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+                f.write(digest)
+            os.replace(tmp_file, self.digest_file)
+        except OSError as e:
+            self.logger.warning(f'Could not persist frame digest: {e}')
+
+    @staticmethod
+    def digest(buffer: bytes) -> str:
+        return hashlib.blake2b(buffer, digest_size=16).hexdigest()
+
+    def _driver_seconds(self) -> Optional[tuple]:
+        """Seconds the Waveshare driver spent in bulk SPI writes and waiting on the busy line so far"""
+        if self.model != 'waveshare4':
+            return None
+        epdconfig = self._wave4.epdconfig
+        return epdconfig.spi_stats().get('total_seconds'), epdconfig.busy_stats().get('total_seconds')
+
+    def _schedule_sleep(self):
+        if self._sleep_timer:
+            self._sleep_timer.cancel()
+        self._sleep_timer = threading.Timer(self.idle_sleep_s, self.sleep)
+        self._sleep_timer.daemon = True
+        self._sleep_timer.start()
+
+    def pack(self, image: Image, saturation: float = 0.5) -> bytes:
+        """Convert a rendered image into the panel's packed 4bpp frame buffer
+
+        Args:
+            image (Image): rendered RGB image
+            saturation (float, optional): inky palette saturation. Defaults to 0.5.
+
+        Returns:
+            bytes: frame buffer that can be passed to show()
+        """
+        with self._lock:
+            driver = self._get_driver()
+            if self.model == 'inky':
+                driver.set_image(image, saturation=saturation)
+                return ((driver.buf[:, 0::2] << 4) | (driver.buf[:, 1::2] & 0x0F)).astype(np.uint8).tobytes()
+            if self.model == 'waveshare4':
+                return bytes(driver.getbuffer(self.convert(image)))
+        return b''
+
+    def show(self, buffer: bytes) -> bool:
+        """Refresh the panel with a buffer from pack()
+
+        Returns:
+            bool: False if the panel already shows this frame and the refresh was skipped
+        """
+        digest = self.digest(buffer)
+        with self._lock:
+            # a skipped refresh has no timings, not the ones of the previous refresh
+            self.last_timings = {}
+            if digest == self.frame_digest:
+                self.skipped_refreshes += 1
+                self.logger.info(f'Frame unchanged, skipping refresh ({self.skipped_refreshes} skipped so far)')
+                return False
+            # until the refresh completes the glass content is unknown, also after a crash mid-refresh
+            self._store_digest(None)
+            start = time.perf_counter()
+            driver = self._wake()
+            # a failed refresh must not keep the panel controller awake
+            try:
+                self.last_timings = {'wake': time.perf_counter() - start}
+                driver_before = self._driver_seconds()
+                start = time.perf_counter()
+                if self.model == 'inky':
+                    packed = np.frombuffer(buffer, dtype=np.uint8).reshape(driver.buf.shape[0], -1)
+                    buf = np.empty(driver.buf.shape, dtype=np.uint8)
+                    buf[:, 0::2] = packed >> 4
+                    buf[:, 1::2] = packed & 0x0F
+                    driver.buf = buf
+                    driver.show()
+                elif self.model == 'waveshare4':
+                    driver.display(buffer)
+                refresh = time.perf_counter() - start
+                if driver_before is not None:
+                    spi, busy = (after - before for after, before in zip(self._driver_seconds(), driver_before))
+                    self.last_timings.update(spi_upload=spi, panel_busy=busy)
+                else:
+                    # inky does not report its SPI time
+                    self.last_timings['panel_refresh'] = refresh
+                self.refreshes += 1
+                self._store_digest(digest)
+                return True
+            finally:
+                self._schedule_sleep()
+
+    def clean(self):
+        """Run the panel's clean sequence"""
+        with self._lock:
+            driver = self._wake()
+            try:
+                if self.model == 'inky':
+                    for _ in range(2):
+                        driver.buf[:] = self._inky_clean
+                        driver.show()
+                        time.sleep(1.0)
+                elif self.model == 'waveshare4':
+                    driver.Clear()
+                self._store_digest(None)
+            finally:
+                self._schedule_sleep()
+
+    def sleep(self):
+        """Put the panel into deep sleep now, the next refresh wakes it again"""
+        with self._lock:
+            if self._sleep_timer:
+                self._sleep_timer.cancel()
+                self._sleep_timer = None
+            if not self.awake:
+                return
+            if self.model == 'waveshare4':
+                self.logger.info('Display idle, entering deep sleep')
+                self._driver.sleep()
+            self.awake = False
+
+    def close(self):
+        """Release the panel on shutdown"""
+        try:
+            self.sleep()
+        except Exception as e:
+            self.logger.error(f'Display sleep error: {e}')
@@ -0,0 +1,144 @@
+import numpy as np
+from PIL import Image, ImageEnhance
+from paletteMap import PALETTES, PaletteMap, palette_map
+
+# roughly the distance between neighbouring palette colors, how far ordered dithering offsets a pixel
+_SPREAD = {'acep7': 128, 'mono': 255, 'gray4': 85}
+
+# error diffusion kernels as (dx, dy, weight)
+_FLOYD_STEINBERG = [(1, 0, 7 / 16), (-1, 1, 3 / 16), (0, 1, 5 / 16), (1, 1, 1 / 16)]
+_ATKINSON = [(1, 0, 1 / 8), (2, 0, 1 / 8), (-1, 1, 1 / 8), (0, 1, 1 / 8), (1, 1, 1 / 8), (0, 2, 1 / 8)]
+
+_threshold_maps = {}
+
+
+def _bayer_map(n: int = 8) -> np.ndarray:
+    """n x n ordered dither thresholds in [0, 1)"""
+    m = np.zeros((1, 1))
+    while m.shape[0] < n:
+        m = np.block([[4 * m, 4 * m + 2], [4 * m + 3, 4 * m + 1]])
+    return (m + 0.5) / m.size
+
+
+def _blue_noise_map(n: int = 64, sigma: float = 1.5, seed: int = 7) -> np.ndarray:
+    """n x n blue-noise-like thresholds in [0, 1)
+
+    White noise with its low frequencies removed (a Gaussian high-pass on
+    the torus), rank-ordered so every threshold occurs equally often.
+    """
+    noise = np.random.default_rng(seed).random((n, n))
+    freq = np.fft.fftfreq(n)
+    lowpass = np.exp(-2 * (np.pi * sigma) ** 2 * (freq[:, None] ** 2 + freq[None, :] ** 2))
+    highpass = noise - np.real(np.fft.ifft2(np.fft.fft2(noise) * lowpass))
+    ranks = np.empty(n * n)
+    ranks[np.argsort(highpass, axis=None)] = np.arange(n * n)
+    return ((ranks + 0.5) / (n * n)).reshape(n, n)
+
+
+def _threshold_map(algorithm: str) -> np.ndarray:
+    if algorithm not in _threshold_maps:
+        _threshold_maps[algorithm] = _bayer_map() if algorithm == 'bayer' else _blue_noise_map()
+    return _threshold_maps[algorithm]
+
+
+def _ordered(rgb: np.ndarray, pmap: PaletteMap, thresholds: np.ndarray, spread: float) -> np.ndarray:
+    """Ordered dithering: tile the threshold map over the image, offset every
+    pixel by up to one palette step and pick the nearest color"""
+    h, w = rgb.shape[:2]
+    th, tw = thresholds.shape
+    tiled = np.tile(thresholds, (h // th + 1, w // tw + 1))[:h, :w]
+    return pmap.indices(np.clip(rgb + ((tiled - 0.5) * spread)[..., None], 0, 255))
+
+
+def _error_diffusion(rgb: np.ndarray, pmap: PaletteMap, kernel: list) -> np.ndarray:
+    """Error diffusion processed in wavefronts.
+
+    A pixel only receives error from pixels left of it in its row and from
+    rows above up to one pixel to the right, so all pixels on a line
+    x + 2y = t can be quantized at once. That turns the per-pixel loop into
+    width + 2 * height vectorized steps.
+    """
+    h, w = rgb.shape[:2]
+    buf = rgb.astype(np.float32)
+    out = np.zeros((h, w), dtype=np.uint8)
+    ys_all = np.arange(h)
+    for t in range(w + 2 * (h - 1)):
+        xs = t - 2 * ys_all
+        valid = (xs >= 0) & (xs < w)
+        ys, xs = ys_all[valid], xs[valid]
+        # clamp like Pillow does so accumulated error can not run away
+        old = np.clip(buf[ys, xs], 0, 255)
+        idx = pmap.indices(old)
+        out[ys, xs] = idx
+        err = old - pmap.palette[idx]
+        for dx, dy, weight in kernel:
+            tx, ty = xs + dx, ys + dy
+            inside = (tx >= 0) & (tx < w) & (ty < h)
+            buf[ty[inside], tx[inside]] += err[inside] * weight
+    return out
+
+
+def _pil_floyd_steinberg(img: Image, palette: list) -> Image:
+    """Pillow's built-in C Floyd-Steinberg"""
+    palette_image = Image.new('P', (1, 1))
+    palette_image.putpalette([c for rgb in palette for c in rgb] + [0, 0, 0] * (256 - len(palette)))
+    return img.quantize(palette=palette_image, dither=Image.Dither.FLOYDSTEINBERG)
+
+
+ALGORITHMS = ('pil', 'none', 'bayer', 'blue_noise', 'floyd_steinberg', 'atkinson')
+
+
+def adjust(img: Image, saturation: float = 1.0, gamma: float = 1.0, enhance: bool = False) -> Image:
+    """Apply saturation as one color matrix pass and gamma as one lookup table pass
+
+    The matrix is the same blend with the luma image that ImageEnhance.Color
+    does, but it rounds differently and moves about 4% of the pixels by one
+    level. enhance=True uses ImageEnhance.Color itself.
+    """
+    img = img.convert('RGB')
+    if saturation != 1.0 and enhance:
+        img = ImageEnhance.Color(img).enhance(saturation)
+    elif saturation != 1.0:
+        luma = (0.299, 0.587, 0.114)
+        matrix = []
+        for channel in range(3):
+            matrix += [(1 - saturation) * weight + (saturation if i == channel else 0) for i, weight in enumerate(luma)] + [0]
+        img = img.convert('RGB', matrix)
+    if gamma != 1.0:
+        img = img.point([round(255 * (v / 255) ** (1 / gamma)) for v in range(256)] * 3)
+    return img
+
+
+def dither(img: Image, palette: str = 'acep7', algorithm: str = 'pil', saturation: float = 1.0, gamma: float = 1.0) -> Image:
+    """Quantize an image to a panel palette
+
+    Args:
+        img (Image): source image
+        palette (str, optional): acep7, mono or gray4. Defaults to acep7.
+        algorithm (str, optional): one of ALGORITHMS. Defaults to pil.
+        saturation (float, optional): saturation factor. Defaults to 1.0.
+        gamma (float, optional): gamma applied before quantizing. Defaults to 1.0.
+
+    Returns:
+        Image: 'P' image whose palette holds the panel colors in code order
+    """
+    colors = PALETTES[palette]
+    # the pil path keeps the exact ImageEnhance output the panel always showed
+    img = adjust(img, saturation=saturation, gamma=gamma, enhance=algorithm == 'pil')
+    if algorithm == 'pil':
+        return _pil_floyd_steinberg(img, colors)
+    pmap = palette_map(palette)
+    if algorithm == 'none':
+        return pmap.quantize(img)
+    rgb = np.asarray(img, dtype=np.float32)
+    if algorithm in ('bayer', 'blue_noise'):
+        codes = _ordered(rgb, pmap, _threshold_map(algorithm), _SPREAD[palette])
+    elif algorithm == 'floyd_steinberg':
+        codes = _error_diffusion(rgb, pmap, _FLOYD_STEINBERG)
+    elif algorithm == 'atkinson':
+        codes = _error_diffusion(rgb, pmap, _ATKINSON)
+    else:
+        raise ValueError(f'Unknown dither algorithm {algorithm}, use one of {", ".join(ALGORITHMS)}')
+    out = Image.fromarray(codes, mode='P')
+    out.putpalette([c for rgb in colors for c in rgb])
+    return out
@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Optional
+
+# events the button service sends to the display service
+EVENT_TYPES = ('skipped', 'paused', 'cycle_idle')
+DEFAULT_SOCKET = '/tmp/spotipi-eink-events.sock'
+
+# send_event runs in the button service, which logs through the root logger
+logger = logging.getLogger(__name__)
+
+
+def socket_from_config(config) -> str:
+    """Path of the event socket from eink_options.ini"""
+    return config.get('DEFAULT', 'event_socket', fallback=DEFAULT_SOCKET)
+
+
+def send_event(path: str, event_type: str, **fields) -> bool:
+    """Send one event to the display service, never blocks or raises
+
+    Args:
+        path (str): event socket path
+        event_type (str): one of EVENT_TYPES
+        **fields: extra JSON serialisable values of the event
+
+    Returns:
+        bool: False if the event was dropped or the display service is not listening
+    """
+    if event_type not in EVENT_TYPES:
+        logger.warning(f'Dropping unknown event type {event_type}')
+        return False
+    try:
+        message = json.dumps(dict(fields, type=event_type, sent=time.time())).encode('utf-8')
+    except (TypeError, ValueError) as e:
+        logger.warning(f'Dropping unserialisable {event_type} event: {e}')
+        return False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            sock.sendto(message, path)
+        return True
+    except OSError:
+        return False
+
+
+class EventListener:
+    """Receives typed events on a Unix datagram socket.
+
+    Every valid event is handed to handler on the listener thread, which
+    should only record it and wake whoever acts on it.
+    """
+
+    def __init__(self, path: str, handler, logger):
+        """
+        Args:
+            path (str): socket path, a stale socket file is replaced
+            handler (callable): dict event -> None
+            logger: service logger
+        """
+        self.path = path
+        self.handler = handler
+        self.logger = logger
+        self._sock: Optional[socket.socket] = None
+        self._thread = None
+
+    def start(self):
+        """Bind the socket and start listening in the background"""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+        self._thread = threading.Thread(target=self._run, name='event-listener', daemon=True)
+        self._thread.start()
+        self.logger.info(f'Listening for button events on {self.path}')
+
+    def _run(self):
+        while True:
+            try:
+                data = self._sock.recv(4096)
+            except OSError:
+                # socket closed
+                return
+            try:
+                event = json.loads(data)
+            except ValueError:
+                self.logger.warning('Ignoring malformed event')
+                continue
+            if not isinstance(event, dict) or event.get('type') not in EVENT_TYPES:
+                self.logger.warning(f'Ignoring unknown event {event}')
+                continue
+            latency_ms = (time.time() - event.get('sent', time.time())) * 1000
+            self.logger.info(f'Event {event["type"]} received after {latency_ms:.0f}ms')
+            try:
+                self.handler(event)
+            except Exception as e:
+                self.logger.error(f'Event handler error: {e}')
+
+    def close(self):
+        """Stop listening and remove the socket file"""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
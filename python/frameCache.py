@@ -0,0 +1,56 @@
+import hashlib
+import zlib
+from typing import Optional
+from diskCache import DiskCache
+
+
+class FrameCache(DiskCache):
+    """On-disk cache of packed panel frame buffers.
+
+    Keys combine a track key with a fingerprint of every config value that
+    changes the rendered layout, so editing the config never serves a stale
+    frame. Buffers are stored raw (4bpp/1bpp as packed by the panel driver)
+    or zlib compressed, marked by a one byte header.
+    """
+
+    SUFFIX = '.frame'
+    _RAW = b'R'
+    _ZLIB = b'Z'
+
+    def __init__(self, cache_dir: str, max_bytes: int, logger, compress: bool = True):
+        """
+        Args:
+            cache_dir (str): directory holding the cached frames
+            max_bytes (int): byte budget of the cache directory
+            logger: service logger
+            compress (bool, optional): zlib compress stored frames. Defaults to True.
+        """
+        super().__init__(cache_dir, max_bytes, logger)
+        self.compress = compress
+
+    @staticmethod
+    def fingerprint(*values) -> str:
+        """Short stable hash of the layout affecting values"""
+        return hashlib.sha1(repr(values).encode('utf-8')).hexdigest()[:16]
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the packed frame stored under key or None"""
+        data = self.get_bytes(key)
+        if data is None:
+            return None
+        try:
+            if data[:1] == self._ZLIB:
+                return zlib.decompress(data[1:])
+            return data[1:]
+        except zlib.error as e:
+            self.logger.warning(f'Dropping corrupt cached frame: {e}')
+            self.drop(key)
+            self.hits -= 1
+            self.misses += 1
+            return None
+
+    def put(self, key: str, buffer: bytes) -> bool:
+        """Store a packed frame under key, returns False if it could not be written"""
+        if self.compress:
+            return self.put_bytes(key, self._ZLIB + zlib.compress(buffer, 6))
+        return self.put_bytes(key, self._RAW + bytes(buffer))
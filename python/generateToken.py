@@ -5,7 +5,7 @@ from spotipy.oauth2 import SpotifyOAuth
 def main():
     if len(sys.argv) > 1:
         username = sys.argv[1]
-        scope = 'user-read-currently-playing,user-modify-playback-state'
+        scope = 'user-read-currently-playing,user-modify-playback-state,user-read-playback-state,user-read-recently-played,user-library-read,playlist-read-private'
 
         # This way removes the need for a browser, it will instead give the URL to visit in the terminal
         auth = SpotifyOAuth(scope=scope, open_browser=False)
@@ -0,0 +1,90 @@
+import collections
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class TimedSession(requests.Session):
+    """requests.Session with default timeouts and per-request latency.
+
+    Every request without an explicit timeout, like the cover downloads,
+    gets the session timeout, so a hung socket can not block the caller
+    forever. spotipy passes its own requests_timeout (5 seconds by default)
+    on every call, which takes precedence. Latencies are kept per host for
+    the last samples.
+    """
+
+    def __init__(self, timeout, samples: int = 100):
+        """
+        Args:
+            timeout (tuple): (connect, read) timeout in seconds
+            samples (int, optional): latencies kept per host
+        """
+        super().__init__()
+        self.timeout = timeout
+        self._samples = samples
+        self._latency = collections.defaultdict(lambda: collections.deque(maxlen=self._samples))
+        self._latency_lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        start = time.perf_counter()
+        try:
+            return super().request(method, url, **kwargs)
+        finally:
+            with self._latency_lock:
+                self._latency[urlsplit(url).netloc].append(time.perf_counter() - start)
+
+    def latency_stats(self) -> dict:
+        """host -> count, last, mean and max latency in seconds of the kept samples"""
+        with self._latency_lock:
+            return {host: {'count': len(samples),
+                           'last': samples[-1],
+                           'mean': sum(samples) / len(samples),
+                           'max': max(samples)}
+                    for host, samples in self._latency.items() if samples}
+
+
+def make_session(timeout=(3.05, 10), retries: int = 3, backoff_factor: float = 0.3,
+                 backoff_jitter: float = 0.3, pool_size: int = 4) -> TimedSession:
+    """Build a keep-alive session with bounded, jittered retries
+
+    Only idempotent requests are retried, on connection errors and 5xx
+    responses. 429 is not retried here so the caller sees Retry-After.
+
+    Args:
+        timeout (tuple, optional): (connect, read) timeout in seconds
+        retries (int, optional): retries per request
+        backoff_factor (float, optional): exponential back-off base in seconds
+        backoff_jitter (float, optional): random seconds added to every back-off
+        pool_size (int, optional): keep-alive connections per host
+
+    Returns:
+        TimedSession: the session
+    """
+    retry_args = dict(total=retries, connect=retries, read=retries, status=retries,
+                      backoff_factor=backoff_factor, status_forcelist=(500, 502, 503, 504),
+                      # urllib3 would retry any 429 that carries Retry-After and sleep through it
+                      respect_retry_after_header=False, raise_on_status=False)
+    try:
+        retry = Retry(backoff_jitter=backoff_jitter, **retry_args)
+    except TypeError:
+        # urllib3 < 2 has no jitter
+        retry = Retry(**retry_args)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = TimedSession(timeout)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def session_from_config(config) -> TimedSession:
+    """Build the session from the http_* options of eink_options.ini"""
+    return make_session(timeout=(config.getfloat('DEFAULT', 'http_connect_timeout_s', fallback=3.05),
+                                 config.getfloat('DEFAULT', 'http_read_timeout_s', fallback=10)),
+                        retries=config.getint('DEFAULT', 'http_retries', fallback=3),
+                        pool_size=config.getint('DEFAULT', 'http_pool_size', fallback=4))
@@ -0,0 +1,155 @@
+import os
+import random
+import threading
+from PIL import Image
+from typing import Optional
+
+IDLE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def load_idle_image(path: str, target_size: tuple, budget_bytes: int) -> Image.Image:
+    """Decode an idle photo at no more than the size the layout needs.
+
+    JPEGs are DCT-scaled while decoding, other formats are only decoded if
+    their full size fits into budget_bytes.
+
+    Args:
+        path (str): image file
+        target_size (tuple): (width, height) the image will be fitted to
+        budget_bytes (int): largest decoded RGB image allowed
+
+    Returns:
+        Image.Image: RGB image, raises MemoryError if it is too large
+    """
+    with Image.open(path) as img:
+        if img.format == 'JPEG':
+            img.draft('RGB', target_size)
+        if img.width * img.height * 3 > budget_bytes:
+            raise MemoryError(f'{img.width}x{img.height} exceeds the idle decode budget')
+        return img.convert('RGB')
+
+
+class IdleFramePool:
+    """Panel-ready frames for every image in the idle directory.
+
+    The directory is indexed by file name, mtime and size. A background
+    thread renders each new or changed image once into the frame cache, so
+    cycling idle images only picks an already packed buffer. Images are
+    decoded one at a time and never above decode_budget_bytes.
+    """
+
+    def __init__(self, idle_dir: str, render, frame_cache, fingerprint: str, target_size: tuple, logger,
+                 decode_budget_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            idle_dir (str): directory with the idle photos
+            render (callable): Image -> packed frame buffer (or None on error)
+            frame_cache (FrameCache): where the rendered frames are kept
+            fingerprint (str): layout fingerprint, part of every cache key
+            target_size (tuple): panel (width, height)
+            logger: service logger
+            decode_budget_bytes (int, optional): largest decoded image allowed
+        """
+        self.idle_dir = idle_dir
+        self.render = render
+        self.frame_cache = frame_cache
+        self.fingerprint = fingerprint
+        self.target_size = target_size
+        self.logger = logger
+        self.decode_budget_bytes = decode_budget_bytes
+        # file name -> cache key of its frame, only for rendered files
+        self._ready = {}
+        # cache keys of files that could not be rendered, retried once changed
+        self._failed = set()
+        self._lock = threading.Lock()
+        # only one image is decoded and rendered at a time
+        self._render_lock = threading.Lock()
+        self._worker = None
+        self._rescan = threading.Event()
+        self.last_pick = None
+
+    def _key(self, name: str, stat: os.stat_result) -> str:
+        return f'{self.fingerprint}|idle|{name}|{stat.st_mtime_ns}|{stat.st_size}'
+
+    def _index(self) -> dict:
+        """file name -> cache key of every idle image in the directory"""
+        index = {}
+        try:
+            with os.scandir(self.idle_dir) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.lower().endswith(IDLE_EXTENSIONS):
+                        index[entry.name] = self._key(entry.name, entry.stat())
+        except OSError as e:
+            self.logger.warning(f'Could not read idle directory: {e}')
+        return index
+
+    def _render(self, name: str, key: str) -> Optional[bytes]:
+        with self._render_lock:
+            try:
+                img = load_idle_image(os.path.join(self.idle_dir, name), self.target_size, self.decode_budget_bytes)
+            except (OSError, ValueError, MemoryError, Image.DecompressionBombError) as e:
+                self.logger.warning(f'Skipping idle image {name}: {e}')
+                self._failed.add(key)
+                return None
+            buffer = self.render(img)
+            del img
+        if buffer is not None:
+            self.frame_cache.put(key, buffer)
+        return buffer
+
+    def _run(self):
+        while True:
+            self._rescan.wait()
+            self._rescan.clear()
+            index = self._index()
+            with self._lock:
+                # forget deleted and changed files
+                self._ready = {name: key for name, key in self._ready.items() if index.get(name) == key}
+            rendered = 0
+            for name, key in index.items():
+                if name in self._ready or key in self._failed:
+                    continue
+                if key in self.frame_cache or self._render(name, key) is not None:
+                    with self._lock:
+                        self._ready[name] = key
+                    rendered += 1
+            if rendered:
+                self.logger.info(f'Idle frame pool: {len(self._ready)} of {len(index)} images ready')
+
+    def refresh(self):
+        """Re-index the directory and render new or changed images in the background"""
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name='idle-frame-pool', daemon=True)
+            self._worker.start()
+        self._rescan.set()
+
+    def pick(self) -> Optional[bytes]:
+        """Return a random ready idle frame, preferring a different one than last time
+
+        If nothing is ready yet one image is rendered right away. Returns None
+        if the directory holds no usable image.
+        """
+        self.refresh()
+        with self._lock:
+            ready = dict(self._ready)
+        choices = [name for name in ready if name != self.last_pick] or list(ready)
+        random.shuffle(choices)
+        for name in choices:
+            buffer = self.frame_cache.get(ready[name])
+            if buffer is not None:
+                self.last_pick = name
+                return buffer
+            # evicted from the frame cache, render it again
+            with self._lock:
+                self._ready.pop(name, None)
+        # nothing rendered yet, fall back to rendering one image now
+        index = list(self._index().items())
+        random.shuffle(index)
+        for name, key in index:
+            if key in self._failed:
+                continue
+            buffer = self._render(name, key)
+            if buffer is not None:
+                self.last_pick = name
+                return buffer
+        return None
@@ -34,6 +34,7 @@
 #
 
 import logging
+import numpy as np
 from . import epdconfig
 
 # Display resolution
@@ -42,6 +43,17 @@ EPD_HEIGHT = 400
 
 logger = logging.getLogger()
 
+# 0xRRGGBB of each panel color, sorted, and the matching 4-bit color code
+_PALETTE_KEYS = np.array([0x000000, 0x0000ff, 0x00ff00, 0xff0000, 0xff8000, 0xffff00, 0xffffff], dtype=np.uint32)
+_PALETTE_CODES = np.array([0, 3, 2, 4, 6, 5, 1], dtype=np.uint8)
+
+
+def _rgb_to_code(rgb):
+    """Map an (..., 3) array of RGB values to panel color codes, 0 if unknown"""
+    key = (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+    idx = np.searchsorted(_PALETTE_KEYS, key).clip(0, len(_PALETTE_KEYS) - 1)
+    return np.where(_PALETTE_KEYS[idx] == key, _PALETTE_CODES[idx], 0).astype(np.uint8)
+
 
 class EPD:
     def __init__(self):
@@ -88,16 +100,13 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 1)
 
     def ReadBusyHigh(self):
-        logger.debug("e-Paper busy")
-        while (epdconfig.digital_read(self.busy_pin) == 0):      # 0: idle, 1: busy
-            epdconfig.delay_ms(10)
-        logger.debug("e-Paper busy release")
+        # sleeps until the busy line rises, epdconfig records how long it took
+        if not epdconfig.wait_busy(self.busy_pin, 1):
+            logger.warning("e-Paper busy timeout")
 
     def ReadBusyLow(self):
-        logger.debug("e-Paper busy")
-        while (epdconfig.digital_read(self.busy_pin) == 1):      # 0: idle, 1: busy
-            epdconfig.delay_ms(10)
-        logger.debug("e-Paper busy release")
+        if not epdconfig.wait_busy(self.busy_pin, 0):
+            logger.warning("e-Paper busy timeout")
 
     def init(self):
         if (epdconfig.module_init() != 0):
@@ -136,56 +145,33 @@ class EPD:
         return 0
 
     def getbuffer(self, image):
-        buf = [0x00] * int(self.width * self.height / 2)
-        image_monocolor = image.convert('RGB')  # Picture mode conversion
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
+        """Pack a 7-color image into the panel's 4bpp frame buffer.
+
+        Every pixel is mapped to its 4-bit color code with a lookup table
+        (pixels that are not one of the 7 panel colors become black) and
+        two horizontally adjacent pixels are packed into one byte, high
+        nibble first.
+        """
+        imwidth, imheight = image.size
         if (imwidth == self.width and imheight == self.height):
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    Add = int((x + y * self.width) / 2)
-                    Color = 0
-                    if (pixels[x, y][0] == 0 and pixels[x, y][1] == 0 and pixels[x, y][2] == 0):
-                        Color = 0
-                    elif (pixels[x, y][0] == 255 and pixels[x, y][1] == 255 and pixels[x, y][2] == 255):
-                        Color = 1
-                    elif (pixels[x, y][0] == 0 and pixels[x, y][1] == 255 and pixels[x, y][2] == 0):
-                        Color = 2
-                    elif (pixels[x, y][0] == 0 and pixels[x, y][1] == 0 and pixels[x, y][2] == 255):
-                        Color = 3
-                    elif (pixels[x, y][0] == 255 and pixels[x, y][1] == 0 and pixels[x, y][2] == 0):
-                        Color = 4
-                    elif (pixels[x, y][0] == 255 and pixels[x, y][1] == 255 and pixels[x, y][2] == 0):
-                        Color = 5
-                    elif (pixels[x, y][0] == 255 and pixels[x, y][1] == 128 and pixels[x, y][2] == 0):
-                        Color = 6
-                    data_t = buf[Add] & (~(0xF0 >> ((x % 2) * 4)))
-                    buf[Add] = data_t | ((Color << 4) >> ((x % 2) * 4))
+            codes = self._color_codes(image)
         elif (imwidth == self.height and imheight == self.width):
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    Add = int((newx + newy * self.width) / 2)
-                    Color = 0
-                    if (pixels[x, y][0] == 0 and pixels[x, y][1] == 0 and pixels[x, y][2] == 0):
-                        Color = 0
-                    elif (pixels[x, y][0] == 255 and pixels[x, y][1] == 255 and pixels[x, y][2] == 255):
-                        Color = 1
-                    elif (pixels[x, y][0] == 0 and pixels[x, y][1] == 255 and pixels[x, y][2] == 0):
-                        Color = 2
-                    elif (pixels[x, y][0] == 0 and pixels[x, y][1] == 0 and pixels[x, y][2] == 255):
-                        Color = 3
-                    elif (pixels[x, y][0] == 255 and pixels[x, y][1] == 0 and pixels[x, y][2] == 0):
-                        Color = 4
-                    elif (pixels[x, y][0] == 255 and pixels[x, y][1] == 255 and pixels[x, y][2] == 0):
-                        Color = 5
-                    elif (pixels[x, y][0] == 255 and pixels[x, y][1] == 128 and pixels[x, y][2] == 0):
-                        Color = 6
-                    data_t = buf[Add] & (~(0xF0 >> ((newx % 2) * 4)))
-                    buf[Add] = data_t | ((Color << 4) >> ((newx % 2) * 4))
-        return buf
+            # portrait image, rotate it into the panel orientation
+            codes = np.rot90(self._color_codes(image))
+        else:
+            logger.warning("Wrong image dimensions: must be " +
+                           str(self.width) + "x" + str(self.height))
+            return bytes(self.width * self.height // 2)
+        return ((codes[:, 0::2] << 4) | codes[:, 1::2]).tobytes()
+
+    def _color_codes(self, image):
+        if image.mode == 'P':
+            # quantized image: translate the palette once, then index it
+            palette = image.getpalette('RGB') or []
+            palette = palette[:768] + [0] * (768 - len(palette[:768]))
+            lut = _rgb_to_code(np.array(palette, dtype=np.uint32).reshape(256, 3))
+            return lut[np.asarray(image)]
+        return _rgb_to_code(np.asarray(image.convert('RGB'), dtype=np.uint32))
 
     def display(self, image):
         self.send_command(0x61)  # Set Resolution setting
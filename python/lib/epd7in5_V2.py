@@ -29,6 +29,7 @@
 
 
 import logging
+import numpy as np
 from . import epdconfig
 
 # Display resolution
@@ -43,6 +44,50 @@ GRAY4 = 0x00  # Blackest
 logger = logging.getLogger(__name__)
 
 
+def _gray_level_table():
+    # 0xC0 and 0x80 are shifted down one level before taking the top 2 bits
+    table = np.arange(256, dtype=np.uint8)
+    table[0xC0] = 0x80
+    table[0x80] = 0x40
+    return table >> 6
+
+
+def _plane_table(bits):
+    # each byte of the 2bpp buffer holds 4 pixels and becomes one nibble of
+    # the 1bpp controller plane, bits maps a 2-bit gray level to a plane bit
+    table = np.zeros(256, dtype=np.uint8)
+    for byte in range(256):
+        for shift in (6, 4, 2, 0):
+            table[byte] = (table[byte] << 1) | bits[(byte >> shift) & 0x03]
+    return table
+
+
+# L value -> 2-bit gray level
+_GRAY_LEVEL = _gray_level_table()
+# 2bpp byte -> plane nibble for the 0x10 (old data) and 0x13 (new data) RAM
+_PLANE_10 = _plane_table((1, 0, 1, 0))
+_PLANE_13 = _plane_table((1, 1, 0, 0))
+
+
+# byte -> byte with every bit flipped, for bytes.translate
+_INVERT = bytes(range(255, -1, -1))
+
+
+def _inverted(data):
+    """Return a copy of a frame buffer with every bit flipped"""
+    if not isinstance(data, (bytes, bytearray)):
+        data = bytes(data)
+    return data.translate(_INVERT)
+
+
+def _as_array(data):
+    """View a frame buffer as a uint8 array without copying bytes-like input"""
+    try:
+        return np.frombuffer(data, dtype=np.uint8)
+    except TypeError:
+        return np.asarray(data, dtype=np.uint8)
+
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -80,18 +125,15 @@ class EPD:
     def send_data2(self, data):
         epdconfig.digital_write(self.dc_pin, 1)
         epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.SPI.writebytes2(data)
+        epdconfig.spi_writebyte2(data)
         epdconfig.digital_write(self.cs_pin, 1)
 
     def ReadBusy(self):
-        logger.debug("e-Paper busy")
+        # BUSY_N is low while busy, the line itself signals the release
         self.send_command(0x71)
-        busy = epdconfig.digital_read(self.busy_pin)
-        while (busy == 0):
-            self.send_command(0x71)
-            busy = epdconfig.digital_read(self.busy_pin)
+        if not epdconfig.wait_busy(self.busy_pin, 1):
+            logger.warning("e-Paper busy timeout")
         epdconfig.delay_ms(20)
-        logger.debug("e-Paper busy release")
 
     def init(self):
         if (epdconfig.module_init() != 0):
@@ -248,65 +290,28 @@ class EPD:
             logger.warning("Wrong image dimensions: must be " +
                            str(self.width) + "x" + str(self.height))
             # return a blank buffer
-            return [0x00] * (int(self.width/8) * self.height)
+            return bytes(int(self.width/8) * self.height)
 
-        buf = bytearray(img.tobytes('raw'))
         # The bytes need to be inverted, because in the PIL world 0=black and 1=white, but
         # in the e-paper world 0=white and 1=black.
-        for i in range(len(buf)):
-            buf[i] ^= 0xFF
-        return buf
+        return img.tobytes('raw').translate(_INVERT)
 
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i = 0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
+        imwidth, imheight = image.size
         if (imwidth == self.width and imheight == self.height):
             logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if (pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i = i+1
-                    if (i % 4 == 0):
-                        buf[int((x + (y * self.width))/4)] = ((pixels[x-3, y] & 0xc0) | (pixels[x-2, y]
-                                                                                         & 0xc0) >> 2 | (pixels[x-1, y] & 0xc0) >> 4 | (pixels[x, y] & 0xc0) >> 6)
-
+            levels = _GRAY_LEVEL[np.asarray(image.convert('L'))]
         elif (imwidth == self.height and imheight == self.width):
             logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = self.height - x - 1
-                    if (pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i = i+1
-                    if (i % 4 == 0):
-                        buf[int((newx + (newy * self.width))/4)] = ((pixels[x, y-3] & 0xc0) | (
-                            pixels[x, y-2] & 0xc0) >> 2 | (pixels[x, y-1] & 0xc0) >> 4 | (pixels[x, y] & 0xc0) >> 6)
-        return buf
+            levels = np.rot90(_GRAY_LEVEL[np.asarray(image.convert('L'))])
+        else:
+            return bytes([0xFF]) * (int(self.width / 4) * self.height)
+        return ((levels[:, 0::4] << 6) | (levels[:, 1::4] << 4) |
+                (levels[:, 2::4] << 2) | levels[:, 3::4]).tobytes()
 
     def display(self, image):
-        if (self.width % 8 == 0):
-            Width = self.width // 8
-        else:
-            Width = self.width // 8 + 1
-        Height = self.height
-        image1 = [0xFF] * int(self.width * self.height / 8)
-        for j in range(Height):
-            for i in range(Width):
-                image1[i + j * Width] = ~image[i + j * Width]
         self.send_command(0x10)
-        self.send_data2(image1)
+        self.send_data2(_inverted(image))
 
         self.send_command(0x13)
         self.send_data2(image)
@@ -317,9 +322,9 @@ class EPD:
 
     def Clear(self):
         self.send_command(0x10)
-        self.send_data2([0xFF] * int(self.width * self.height / 8))
+        self.send_data2(bytes([0xFF]) * int(self.width * self.height / 8))
         self.send_command(0x13)
-        self.send_data2([0x00] * int(self.width * self.height / 8))
+        self.send_data2(bytes(int(self.width * self.height / 8)))
 
         self.send_command(0x12)
         epdconfig.delay_ms(100)
@@ -359,10 +364,9 @@ class EPD:
         self.send_data((Yend-1) % 256)  # y-end
         self.send_data(0x01)
 
-        image1 = [0xFF] * int(self.width * self.height / 8)
-        for j in range(Height):
-            for i in range(Width):
-                image1[i + j * Width] = ~Image[i + j * Width]
+        # the window's bytes inverted, padded to a full plane with 0xFF
+        region = Width * Height
+        image1 = _inverted(Image[:region]) + bytes([0xFF]) * (int(self.width * self.height / 8) - region)
 
         self.send_command(0x13)  # Write Black and White image to RAM
         self.send_data2(image1)
@@ -372,69 +376,12 @@ class EPD:
         self.ReadBusy()
 
     def display_4Gray(self, image):
+        buf = _as_array(image)
         self.send_command(0x10)
-        for i in range(0, 48000):
-            temp3 = 0
-            for j in range(0, 2):
-                temp1 = image[i*2+j]
-                for k in range(0, 2):
-                    temp2 = temp1 & 0xC0
-                    if (temp2 == 0xC0):
-                        temp3 |= 0x00
-                    elif (temp2 == 0x00):
-                        temp3 |= 0x01
-                    elif (temp2 == 0x80):
-                        temp3 |= 0x01
-                    else:  # 0x40
-                        temp3 |= 0x00
-                    temp3 <<= 1
-
-                    temp1 <<= 2
-                    temp2 = temp1 & 0xC0
-                    if (temp2 == 0xC0):
-                        temp3 |= 0x00
-                    elif (temp2 == 0x00):
-                        temp3 |= 0x01
-                    elif (temp2 == 0x80):
-                        temp3 |= 0x01
-                    else:  # 0x40
-                        temp3 |= 0x00
-                    if (j != 1 or k != 1):
-                        temp3 <<= 1
-                    temp1 <<= 2
-            self.send_data(temp3)
+        self.send_data2(((_PLANE_10[buf[0::2]] << 4) | _PLANE_10[buf[1::2]]).tobytes())
 
         self.send_command(0x13)
-        for i in range(0, 48000):
-            temp3 = 0
-            for j in range(0, 2):
-                temp1 = image[i*2+j]
-                for k in range(0, 2):
-                    temp2 = temp1 & 0xC0
-                    if (temp2 == 0xC0):
-                        temp3 |= 0x00
-                    elif (temp2 == 0x00):
-                        temp3 |= 0x01
-                    elif (temp2 == 0x80):
-                        temp3 |= 0x00
-                    else:  # 0x40
-                        temp3 |= 0x01
-                    temp3 <<= 1
-
-                    temp1 <<= 2
-                    temp2 = temp1 & 0xC0
-                    if (temp2 == 0xC0):
-                        temp3 |= 0x00
-                    elif (temp2 == 0x00):
-                        temp3 |= 0x01
-                    elif (temp2 == 0x80):
-                        temp3 |= 0x00
-                    else:  # 0x40
-                        temp3 |= 0x01
-                    if (j != 1 or k != 1):
-                        temp3 <<= 1
-                    temp1 <<= 2
-            self.send_data(temp3)
+        self.send_data2(((_PLANE_13[buf[0::2]] << 4) | _PLANE_13[buf[1::2]]).tobytes())
 
         self.send_command(0x12)
         epdconfig.delay_ms(100)
@@ -32,6 +32,7 @@
 #
 
 from pathlib import Path
+import configparser
 import re
 import os
 import logging
@@ -40,6 +41,148 @@ import time
 
 logger = logging.getLogger()
 
+CONFIG_FILE = os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'eink_options.ini')
+SPIDEV_BUFSIZ_FILE = Path('/sys/module/spidev/parameters/bufsiz')
+SPI_SPEED_HZ = 4000000
+# a full colour refresh of the 4.01" panel takes about 30s
+BUSY_TIMEOUT_S = 60
+BUSY_EDGE_SLICE_S = 1.0
+BUSY_POLL_S = 0.01
+
+
+def spidev_bufsiz():
+    """Largest single transfer the spidev kernel driver accepts"""
+    try:
+        return int(SPIDEV_BUFSIZ_FILE.read_text())
+    except (OSError, ValueError):
+        return 4096
+
+
+def load_spi_options():
+    """Read SPI clock speed and transfer chunk size from eink_options.ini"""
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE)
+    bufsiz = spidev_bufsiz()
+    speed_hz = config.getint('DEFAULT', 'spi_speed_hz', fallback=SPI_SPEED_HZ)
+    chunk_size = config.getint('DEFAULT', 'spi_chunk_size', fallback=bufsiz)
+    return speed_hz, max(1, min(chunk_size, bufsiz))
+
+
+def as_buffer(data):
+    """Return a byte view of bytes, bytearray, memoryview or NumPy data
+    without copying it, lists of ints are converted once
+    """
+    try:
+        return memoryview(data).cast('B')
+    except TypeError:
+        return memoryview(bytes(data))
+
+
+class TransferStats:
+    """Per-transfer timings and running throughput of the bulk SPI writes"""
+
+    def __init__(self):
+        self.transfers = 0
+        self.total_bytes = 0
+        self.total_seconds = 0.0
+        self.last_bytes = 0
+        self.last_seconds = 0.0
+
+    def record(self, nbytes, seconds):
+        self.transfers += 1
+        self.total_bytes += nbytes
+        self.total_seconds += seconds
+        self.last_bytes = nbytes
+        self.last_seconds = seconds
+        logger.debug(f"spi: {nbytes} bytes in {seconds * 1000:.1f} ms ({self.rate(nbytes, seconds) / 1000:.0f} kB/s)")
+
+    @staticmethod
+    def rate(nbytes, seconds):
+        return nbytes / seconds if seconds > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            'transfers': self.transfers,
+            'total_bytes': self.total_bytes,
+            'total_seconds': self.total_seconds,
+            'bytes_per_second': self.rate(self.total_bytes, self.total_seconds),
+            'last_bytes': self.last_bytes,
+            'last_seconds': self.last_seconds,
+            'last_bytes_per_second': self.rate(self.last_bytes, self.last_seconds),
+        }
+
+
+def chunked_write(write, data, chunk_size, stats):
+    """Send data with write() in chunk_size slices and record the timing"""
+    view = as_buffer(data)
+    start = time.perf_counter()
+    for offset in range(0, len(view), chunk_size):
+        write(view[offset:offset + chunk_size])
+    stats.record(len(view), time.perf_counter() - start)
+
+
+class BusyMonitor:
+    """Edge triggered waits on the busy line and the duration of every busy phase.
+
+    wait_for_edge sleeps in the kernel until the line changes (sysfs edges
+    with RPi.GPIO, gpiochip line events with the lgpio based RPi.GPIO of
+    Bookworm and with Jetson/Hobot.GPIO). It waits in slices and re-reads
+    the line after each, so an edge between the read and the wait costs one
+    slice at most. If the library cannot watch the pin, e.g. because another
+    process already does, it falls back to polling.
+    """
+
+    def __init__(self, gpio):
+        self.GPIO = gpio
+        self.edge_detect = hasattr(gpio, 'wait_for_edge')
+        self.phases = 0
+        self.timeouts = 0
+        self.total_seconds = 0.0
+        self.last_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def wait(self, pin, level, timeout_s):
+        """Block until pin reads level, returns False if timeout_s passed first"""
+        start = time.perf_counter()
+        deadline = start + timeout_s
+        edge = self.GPIO.RISING if level else self.GPIO.FALLING
+        reached = False
+        while True:
+            if self.GPIO.input(pin) == level:
+                reached = True
+                break
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            if self.edge_detect:
+                try:
+                    self.GPIO.wait_for_edge(pin, edge, timeout=max(1, int(min(remaining, BUSY_EDGE_SLICE_S) * 1000)))
+                    continue
+                except (RuntimeError, ValueError) as e:
+                    logger.warning(f"busy: no edge detection on pin {pin} ({e}), polling instead")
+                    self.edge_detect = False
+            time.sleep(min(remaining, BUSY_POLL_S))
+        self.record(time.perf_counter() - start, reached)
+        return reached
+
+    def record(self, seconds, reached):
+        self.phases += 1
+        self.timeouts += not reached
+        self.total_seconds += seconds
+        self.last_seconds = seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        logger.debug(f"busy: {seconds * 1000:.1f} ms{'' if reached else ' (timeout)'}")
+
+    def as_dict(self):
+        return {
+            'phases': self.phases,
+            'timeouts': self.timeouts,
+            'total_seconds': self.total_seconds,
+            'last_seconds': self.last_seconds,
+            'max_seconds': self.max_seconds,
+            'edge_detect': self.edge_detect,
+        }
+
 
 class RaspberryPi:
     # Pin definition
@@ -54,6 +197,9 @@ class RaspberryPi:
         import RPi.GPIO
         self.GPIO = RPi.GPIO
         self.SPI = spidev.SpiDev()
+        self.spi_speed_hz, self.spi_chunk_size = load_spi_options()
+        self.spi_transfer_stats = TransferStats()
+        self.busy_monitor = BusyMonitor(self.GPIO)
 
     def digital_write(self, pin, value):
         self.GPIO.output(pin, value)
@@ -64,11 +210,20 @@ class RaspberryPi:
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
+    def wait_busy(self, pin, level, timeout_s=BUSY_TIMEOUT_S):
+        return self.busy_monitor.wait(pin, level, timeout_s)
+
+    def busy_stats(self):
+        return self.busy_monitor.as_dict()
+
     def spi_writebyte(self, data):
         self.SPI.writebytes(data)
 
     def spi_writebyte2(self, data):
-        self.SPI.writebytes2(data)
+        chunked_write(self.SPI.writebytes2, data, self.spi_chunk_size, self.spi_transfer_stats)
+
+    def spi_stats(self):
+        return self.spi_transfer_stats.as_dict()
 
     def module_init(self):
         self.GPIO.setmode(self.GPIO.BCM)
@@ -82,7 +237,7 @@ class RaspberryPi:
 
         # SPI device, bus = 0, device = 0
         self.SPI.open(0, 0)
-        self.SPI.max_speed_hz = 4000000
+        self.SPI.max_speed_hz = self.spi_speed_hz
         self.SPI.mode = 0b00
         return 0
 
@@ -121,6 +276,8 @@ class JetsonNano:
             raise RuntimeError('Cannot find sysfs_software_spi.so')
         import Jetson.GPIO
         self.GPIO = Jetson.GPIO
+        self.spi_transfer_stats = TransferStats()
+        self.busy_monitor = BusyMonitor(self.GPIO)
 
     def digital_write(self, pin, value):
         self.GPIO.output(pin, value)
@@ -131,12 +288,25 @@ class JetsonNano:
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
+    def wait_busy(self, pin, level, timeout_s=BUSY_TIMEOUT_S):
+        return self.busy_monitor.wait(pin, level, timeout_s)
+
+    def busy_stats(self):
+        return self.busy_monitor.as_dict()
+
     def spi_writebyte(self, data):
         self.SPI.SYSFS_software_spi_transfer(data[0])
 
     def spi_writebyte2(self, data):
-        for i in range(len(data)):
-            self.SPI.SYSFS_software_spi_transfer(data[i])
+        # software SPI clocks out one byte at a time
+        view = as_buffer(data)
+        start = time.perf_counter()
+        for byte in view:
+            self.SPI.SYSFS_software_spi_transfer(byte)
+        self.spi_transfer_stats.record(len(view), time.perf_counter() - start)
+
+    def spi_stats(self):
+        return self.spi_transfer_stats.as_dict()
 
     def module_init(self):
         self.GPIO.setmode(self.GPIO.BCM)
@@ -174,6 +344,9 @@ class SunriseX3:
         import Hobot.GPIO
         self.GPIO = Hobot.GPIO
         self.SPI = spidev.SpiDev()
+        self.spi_speed_hz, self.spi_chunk_size = load_spi_options()
+        self.spi_transfer_stats = TransferStats()
+        self.busy_monitor = BusyMonitor(self.GPIO)
 
     def digital_write(self, pin, value):
         self.GPIO.output(pin, value)
@@ -184,13 +357,21 @@ class SunriseX3:
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
+    def wait_busy(self, pin, level, timeout_s=BUSY_TIMEOUT_S):
+        return self.busy_monitor.wait(pin, level, timeout_s)
+
+    def busy_stats(self):
+        return self.busy_monitor.as_dict()
+
     def spi_writebyte(self, data):
         self.SPI.writebytes(data)
 
     def spi_writebyte2(self, data):
-        # for i in range(len(data)):
-        #     self.SPI.writebytes([data[i]])
-        self.SPI.xfer3(data)
+        # xfer3 wants a sequence of ints, one chunk at a time keeps it bounded
+        chunked_write(lambda chunk: self.SPI.xfer3(chunk.tolist()), data, self.spi_chunk_size, self.spi_transfer_stats)
+
+    def spi_stats(self):
+        return self.spi_transfer_stats.as_dict()
 
     def module_init(self):
         if self.Flag == 0:
@@ -205,7 +386,7 @@ class SunriseX3:
             self.GPIO.output(self.PWR_PIN, 1)
             # SPI device, bus = 0, device = 0
             self.SPI.open(2, 0)
-            self.SPI.max_speed_hz = 4000000
+            self.SPI.max_speed_hz = self.spi_speed_hz
             self.SPI.mode = 0b00
             return 0
         else:
@@ -232,12 +413,50 @@ def is_raspberry_pi():
     return re.search(r"^Model\s*:\s*Raspberry Pi", cpuinfo, flags=re.M) is not None
 
 
-if is_raspberry_pi():
-    implementation = RaspberryPi()
-elif os.path.exists('/sys/bus/platform/drivers/gpio-x3'):
-    implementation = SunriseX3()
-else:
-    implementation = JetsonNano()
+class NoPanel:
+    """Stand-in when no backend can be set up, e.g. on a build machine.
+
+    The drivers can still be imported and pack frames with getbuffer, any
+    access to the panel raises RuntimeError with the reason.
+    """
+    # Pin definition
+    RST_PIN = 17
+    DC_PIN = 25
+    CS_PIN = 8
+    BUSY_PIN = 24
+    PWR_PIN = 18
+
+    def __init__(self, reason):
+        self.reason = reason
+
+    def _unavailable(self, *args, **kwargs):
+        raise RuntimeError(f"No e-Paper backend: {self.reason}")
+
+    digital_write = digital_read = spi_writebyte = spi_writebyte2 = wait_busy = module_init = _unavailable
+
+    def delay_ms(self, delaytime):
+        time.sleep(delaytime / 1000.0)
+
+    def spi_stats(self):
+        return TransferStats().as_dict()
+
+    def busy_stats(self):
+        return BusyMonitor(None).as_dict()
+
+    def module_exit(self):
+        pass
+
+
+try:
+    if is_raspberry_pi():
+        implementation = RaspberryPi()
+    elif os.path.exists('/sys/bus/platform/drivers/gpio-x3'):
+        implementation = SunriseX3()
+    else:
+        implementation = JetsonNano()
+except (ImportError, RuntimeError, OSError) as e:
+    logger.warning(f"No e-Paper backend available ({e}), the panel can not be driven")
+    implementation = NoPanel(e)
 
 for func in [x for x in dir(implementation) if not x.startswith('_')]:
     setattr(sys.modules[__name__], func, getattr(implementation, func))
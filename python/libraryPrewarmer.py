@@ -0,0 +1,224 @@
+import contextlib
+import os
+import threading
+import time
+from typing import Optional
+
+SOURCES = ('queue', 'recent', 'saved_albums', 'playlists')
+
+
+def song_from_item(item: dict, images: Optional[list] = None, album_id: Optional[str] = None) -> Optional[list]:
+    """song_request list of a Web API track or episode object, progress unknown
+
+    Args:
+        item (dict): track or episode object
+        images (list, optional): cover variants for simplified tracks without album
+        album_id (str, optional): album id for simplified tracks without album
+
+    Returns:
+        Optional[list]: [title, cover url, artist, None, duration_ms, images, album id], None without item
+    """
+    if not item:
+        return None
+    if item.get('type') == 'episode':
+        images = item.get('images') or item['show'].get('images', [])
+        artist = item['show']['name']
+        album_id = item['show'].get('id')
+    else:
+        if 'album' in item:
+            images = item['album'].get('images', [])
+            album_id = item['album'].get('id')
+        artist = ', '.join(a['name'] for a in item['artists'])
+    images = images or []
+    cover_url = images[0]['url'] if images else ''
+    return [item['name'], cover_url, artist, None, item.get('duration_ms'), images, album_id]
+
+
+class LibraryPrewarmer:
+    """Renders the frames of tracks that are likely to play next.
+
+    A background thread walks the queue, recently played tracks, saved
+    albums and chosen playlists when playback stops and every interval
+    seconds after that. Each track not in the frame cache yet is rendered
+    into it, so the track change later only shows a ready frame. The thread
+    only works while idle: nothing plays (playback()) and the service is not
+    rendering or refreshing a frame itself (hold()). It runs niced, paces its
+    Web API calls and stops a pass once it added cache_share of the frame
+    cache budget, so it never evicts everything that was actually shown.
+    """
+
+    def __init__(self, sp, render, frame_cache, frame_key, logger, sources=SOURCES, playlists=(),
+                 api_calls_per_min: float = 6, interval: float = 1800, cache_share: float = 0.5, nice: int = 10):
+        """
+        Args:
+            sp (spotipy.Spotify): the service's Web API client
+            render (callable): song_request -> True if a frame was rendered into the frame cache
+            frame_cache (FrameCache): where the rendered frames are kept
+            frame_key (callable): song_request -> frame cache key
+            logger: service logger
+            sources (iterable, optional): walked sources, any of SOURCES
+            playlists (iterable, optional): playlist ids or URIs for the playlists source
+            api_calls_per_min (float, optional): Web API calls per minute at most
+            interval (float, optional): seconds between two full passes
+            cache_share (float, optional): share of the frame cache budget one pass may fill
+            nice (int, optional): niceness of the worker thread
+        """
+        self.sp = sp
+        self.render = render
+        self.frame_cache = frame_cache
+        self.frame_key = frame_key
+        self.logger = logger
+        self.sources = [source for source in sources if source in SOURCES]
+        self.playlists = list(playlists)
+        self.api_interval = 60 / api_calls_per_min
+        self.interval = interval
+        self.cache_share = cache_share
+        self.nice = nice
+        self.counters = {'passes': 0, 'api_calls': 0, 'rendered': 0, 'known': 0, 'failed': 0}
+        self._last_call = 0.0
+        self._holds = 0
+        # playing until the first poll tells otherwise
+        self._playing = True
+        self._state_lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle_started = threading.Event()
+        self._worker = None
+
+    def start(self):
+        """Start the background worker, the first pass runs once the service is idle"""
+        if self._worker is None and self.sources:
+            self._worker = threading.Thread(target=self._run, name='library-prewarm', daemon=True)
+            self._worker.start()
+
+    def playback(self, playing: bool):
+        """Report the playback state of the latest poll, the worker only runs while nothing plays"""
+        with self._state_lock:
+            if self._playing and not playing:
+                self._idle_started.set()
+            self._playing = playing
+            self._update_idle()
+
+    @contextlib.contextmanager
+    def hold(self):
+        """Keep the worker waiting while the service renders or refreshes a frame itself"""
+        with self._state_lock:
+            self._holds += 1
+            self._update_idle()
+        try:
+            yield
+        finally:
+            with self._state_lock:
+                self._holds -= 1
+                self._update_idle()
+
+    def _update_idle(self):
+        """Idle when nothing plays and nothing is held, call with the state lock held"""
+        if self._playing or self._holds:
+            self._idle.clear()
+        else:
+            self._idle.set()
+
+    def _run(self):
+        try:
+            # Linux threads are tasks, this only lowers the priority of the worker
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+        except (AttributeError, OSError) as e:
+            self.logger.warning(f'Could not nice the library pre-warming: {e}')
+        while True:
+            self._idle.wait()
+            # this pass covers the idle period that just started
+            self._idle_started.clear()
+            try:
+                self._pass(self.sources)
+            except Exception as e:
+                self.logger.error(f'Library pre-warming failed: {e}')
+            # the next pass when playback stops again or after the interval
+            self._idle_started.wait(self.interval)
+
+    def _pass(self, sources: list):
+        self.counters['passes'] += 1
+        budget = self.frame_cache.max_bytes * self.cache_share
+        added = 0
+        rendered = 0
+        seen = set()
+        for source in sources:
+            for song_request in self._walk(source):
+                key = self.frame_key(song_request)
+                if key in seen:
+                    continue
+                seen.add(key)
+                if key in self.frame_cache:
+                    self.counters['known'] += 1
+                    continue
+                self._idle.wait()
+                if self.render(song_request):
+                    rendered += 1
+                    self.counters['rendered'] += 1
+                    added += self.frame_cache.entry_size(key) or 0
+                else:
+                    self.counters['failed'] += 1
+                if added >= budget:
+                    self.logger.info(f'Library pre-warming: cache share used up after {rendered} frames')
+                    return
+        if rendered:
+            self.logger.info(f'Library pre-warming: {rendered} frames rendered, {len(seen)} tracks checked')
+
+    def _call(self, func, *args, **kwargs) -> Optional[dict]:
+        """Paced Web API call, None if it failed"""
+        while True:
+            self._idle.wait()
+            delay = self._last_call + self.api_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._last_call = time.monotonic()
+            self.counters['api_calls'] += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                status = getattr(e, 'http_status', None)
+                if status == 429:
+                    retry_after = float((getattr(e, 'headers', None) or {}).get('Retry-After', 60))
+                    self.logger.warning(f'Library pre-warming rate limited, waiting {retry_after:.0f}s')
+                    time.sleep(retry_after)
+                    continue
+                if status == 403:
+                    self.logger.warning(f'Library pre-warming not permitted ({e}), run generateToken.py again for the library scopes')
+                else:
+                    self.logger.warning(f'Library pre-warming call failed: {e}')
+                return None
+
+    def _pages(self, first: Optional[dict]):
+        """Items of a paging object and of the pages after it"""
+        page = first
+        while page:
+            yield from page.get('items') or []
+            page = self._call(self.sp.next, page) if page.get('next') else None
+
+    def _walk(self, source: str):
+        """song_request lists of one source, most likely to play first"""
+        if source == 'queue':
+            queue = self._call(self.sp.queue)
+            for item in (queue or {}).get('queue') or []:
+                song = song_from_item(item)
+                if song:
+                    yield song
+        elif source == 'recent':
+            recent = self._call(self.sp.current_user_recently_played, limit=50)
+            for item in (recent or {}).get('items') or []:
+                song = song_from_item(item.get('track'))
+                if song:
+                    yield song
+        elif source == 'saved_albums':
+            for item in self._pages(self._call(self.sp.current_user_saved_albums, limit=20)):
+                album = item['album']
+                # the first 50 tracks come with the album
+                for track in (album.get('tracks') or {}).get('items') or []:
+                    song = song_from_item(track, images=album.get('images'), album_id=album.get('id'))
+                    if song:
+                        yield song
+        elif source == 'playlists':
+            for playlist in self.playlists:
+                for item in self._pages(self._call(self.sp.playlist_items, playlist, limit=100, additional_types=('track', 'episode'))):
+                    song = song_from_item(item.get('track'))
+                    if song:
+                        yield song
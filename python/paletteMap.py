@@ -0,0 +1,93 @@
+import functools
+import numpy as np
+from PIL import Image
+
+# panel palettes, the index of a color is its code in the quantized image
+PALETTES = {
+    # black, white, green, blue, red, yellow, orange in Waveshare/inky order
+    'acep7': [(0x00, 0x00, 0x00), (0xff, 0xff, 0xff), (0x00, 0xff, 0x00), (0x00, 0x00, 0xff),
+              (0xff, 0x00, 0x00), (0xff, 0xff, 0x00), (0xff, 0x80, 0x00)],
+    'mono': [(0x00, 0x00, 0x00), (0xff, 0xff, 0xff)],
+    # the levels epd7in5_V2.getbuffer_4Gray distinguishes
+    'gray4': [(0x00, 0x00, 0x00), (0x80, 0x80, 0x80), (0xc0, 0xc0, 0xc0), (0xff, 0xff, 0xff)],
+}
+BLACK = (0x00, 0x00, 0x00)
+WHITE = (0xff, 0xff, 0xff)
+
+
+def nearest(pixels: np.ndarray, palette: np.ndarray) -> np.ndarray:
+    """Index of the nearest palette color for every pixel of an (..., 3) array"""
+    # |p - c|^2 without the |p|^2 term, which is the same for every color
+    dist = pixels @ (-2 * palette.T) + (palette ** 2).sum(axis=1)
+    return dist.argmin(axis=-1).astype(np.uint8)
+
+
+def _luma(colors: np.ndarray) -> np.ndarray:
+    return colors @ np.array([0.299, 0.587, 0.114])
+
+
+class PaletteMap:
+    """RGB -> palette index through a precomputed 3D lookup table.
+
+    Every channel is cut to bits bits, the table holds the nearest palette
+    color of each cell center, so (2 ** bits) ** 3 bytes, 32 KiB at 5 bits.
+    Mapping a color or a whole image is then a shift and an index.
+    """
+
+    def __init__(self, colors: list, bits: int = 5):
+        """
+        Args:
+            colors (list): palette as (r, g, b) tuples
+            bits (int, optional): table bits per channel
+        """
+        self.colors = [tuple(c) for c in colors]
+        self.palette = np.array(self.colors, dtype=np.float32)
+        self.shift = 8 - bits
+        cells = np.arange(1 << bits, dtype=np.float32) * (1 << self.shift) + ((1 << self.shift) - 1) / 2
+        r, g, b = np.meshgrid(cells, cells, cells, indexing='ij')
+        self.lut = nearest(np.stack((r, g, b), axis=-1), self.palette)
+        # for each palette color the one that reads best on top of it
+        luma = _luma(self.palette)
+        self._contrast = np.abs(luma[:, None] - luma[None, :]).argmax(axis=1)
+
+    def indices(self, rgb: np.ndarray) -> np.ndarray:
+        """Palette index of every pixel of an (..., 3) uint8 array"""
+        cell = rgb.astype(np.uint8) >> self.shift
+        return self.lut[cell[..., 0], cell[..., 1], cell[..., 2]]
+
+    def index(self, rgb: tuple) -> int:
+        """Palette index of a single color"""
+        r, g, b = (int(c) >> self.shift for c in rgb[:3])
+        return int(self.lut[r, g, b])
+
+    def snap(self, rgb: tuple) -> tuple:
+        """Nearest palette color of a single color"""
+        return self.colors[self.index(rgb)]
+
+    def contrast(self, rgb: tuple) -> tuple:
+        """Palette color with the largest luma difference to rgb, e.g. text on a background"""
+        return self.colors[self._contrast[self.index(rgb)]]
+
+    def readable(self, fg: tuple, bg: tuple, min_luma_diff: float = 64) -> bool:
+        """Whether fg text stands out enough on a bg background"""
+        return abs(_luma(np.array(fg, dtype=np.float32)) - _luma(np.array(bg, dtype=np.float32))) >= min_luma_diff
+
+    def histogram(self, image: Image) -> np.ndarray:
+        """Number of pixels of an image that map to each palette color"""
+        return np.bincount(self.indices(np.asarray(image.convert('RGB'))).ravel(), minlength=len(self.colors))
+
+    def quantize(self, image: Image) -> Image:
+        """Map an image to the palette without dithering
+
+        Returns:
+            Image: 'P' image whose palette holds the panel colors in code order
+        """
+        out = Image.fromarray(self.indices(np.asarray(image.convert('RGB'))), mode='P')
+        out.putpalette([c for rgb in self.colors for c in rgb])
+        return out
+
+
+@functools.lru_cache(maxsize=None)
+def palette_map(name: str, bits: int = 5) -> PaletteMap:
+    """The shared PaletteMap of a palette in PALETTES, built on first use"""
+    return PaletteMap(PALETTES[name], bits=bits)
@@ -0,0 +1,108 @@
+import threading
+import time
+
+
+class PollScheduler:
+    """Decides when the service polls currently_playing next.
+
+    - while a track plays it polls every playing_interval seconds at most
+      and wakes end_lead seconds after the predicted end of the track
+    - after burst() (a button press) it polls every min_interval seconds
+      for burst_duration seconds
+    - while nothing plays the interval doubles up to idle_max_interval
+    - a 429 Retry-After always holds back the next poll
+    """
+
+    def __init__(self, logger, min_interval: float = 1.0, playing_interval: float = 15.0,
+                 idle_max_interval: float = 30.0, burst_duration: float = 10.0, end_lead: float = 1.0):
+        """
+        Args:
+            logger: service logger
+            min_interval (float, optional): shortest time between two polls
+            playing_interval (float, optional): longest time between two polls while playing
+            idle_max_interval (float, optional): cap of the idle back-off
+            burst_duration (float, optional): length of the fast polling after burst()
+            end_lead (float, optional): seconds after the predicted track end to poll
+        """
+        self.logger = logger
+        self.min_interval = min_interval
+        self.playing_interval = playing_interval
+        self.idle_max_interval = idle_max_interval
+        self.burst_duration = burst_duration
+        self.end_lead = end_lead
+        self.counters = {'polls': 0, 'playing': 0, 'track_end': 0, 'idle': 0, 'burst': 0, 'rate_limited': 0, 'woken': 0}
+        self._playing = False
+        self._track_end = None
+        self._idle_interval = min_interval
+        self._burst_until = 0.0
+        self._retry_until = 0.0
+        # wake() bumps the generation, wait() returns once it differs from the last one it saw,
+        # so a wake-up between two waits is never lost
+        self._wake = threading.Condition()
+        self._wake_generation = 0
+        self._seen_generation = 0
+
+    def observe(self, song_request: list):
+        """Record the result of a poll
+
+        Args:
+            song_request (list): parsed song info, empty if nothing is playing
+        """
+        self.counters['polls'] += 1
+        now = time.monotonic()
+        self._playing = bool(song_request)
+        self._track_end = None
+        if self._playing:
+            self._idle_interval = self.min_interval
+            progress_ms, duration_ms = song_request[3], song_request[4]
+            if progress_ms is not None and duration_ms:
+                self._track_end = now + max(0, duration_ms - progress_ms) / 1000
+
+    def burst(self):
+        """Poll fast for a while, e.g. after a button press, starting right away"""
+        self._burst_until = time.monotonic() + self.burst_duration
+        self.wake()
+
+    def rate_limited(self, retry_after: float):
+        """Hold back polling after a 429 response"""
+        self.counters['rate_limited'] += 1
+        self._retry_until = time.monotonic() + max(retry_after, self.min_interval)
+        self.logger.warning(f'Spotify rate limit hit, next poll in {retry_after:.0f}s')
+
+    def next_delay(self) -> float:
+        """Seconds to wait before the next poll"""
+        now = time.monotonic()
+        if now < self._retry_until:
+            reason, delay = 'rate_limited', self._retry_until - now
+        elif now < self._burst_until:
+            reason, delay = 'burst', self.min_interval
+        elif self._playing:
+            reason, delay = 'playing', self.playing_interval
+            if self._track_end is not None and self._track_end + self.end_lead - now < delay:
+                reason, delay = 'track_end', self._track_end + self.end_lead - now
+        else:
+            reason, delay = 'idle', self._idle_interval
+            self._idle_interval = min(self._idle_interval * 2, self.idle_max_interval)
+        delay = max(delay, self.min_interval)
+        if reason != 'rate_limited':
+            self.counters[reason] += 1
+        self.logger.debug(f'Next poll in {delay:.1f}s ({reason})')
+        return delay
+
+    def wait(self):
+        """Sleep until the next poll is due or wake() is called"""
+        delay = self.next_delay()
+        with self._wake:
+            if self._wake.wait_for(lambda: self._wake_generation != self._seen_generation, delay):
+                self.counters['woken'] += 1
+            self._seen_generation = self._wake_generation
+        # a wake-up never cuts a Retry-After short
+        remaining = self._retry_until - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def wake(self):
+        """Interrupt wait() so the next poll happens now"""
+        with self._wake:
+            self._wake_generation += 1
+            self._wake.notify_all()
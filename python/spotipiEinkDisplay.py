@@ -5,10 +5,30 @@ from logging.handlers import RotatingFileHandler
 import os
 import traceback
 import configparser
-import requests
+import contextlib
+import io
 import signal
-from PIL import Image, ImageDraw, ImageFont, ImageOps, ImageEnhance, ImageFilter
+import threading
+from PIL import Image, ImageDraw, ImageFont, ImageStat
 from typing import Optional
+from displaySession import DisplaySession
+from coverCache import CoverCache
+from frameCache import FrameCache
+from assetRegistry import AssetRegistry, IMAGES_DIR
+from idleFramePool import IdleFramePool
+from pollScheduler import PollScheduler
+import httpPool
+from backgroundEngine import blurred_background
+import ditherEngine
+from paletteMap import BLACK, palette_map
+from accentCache import AccentCache
+import eventChannel
+import tokenBroker
+from stageTimer import StageTimer
+from libraryPrewarmer import LibraryPrewarmer, song_from_item
+
+# bump when a code change alters the rendered frames, invalidates the frame cache
+FRAME_LAYOUT_VERSION = 6
 
 
 # recursion limiter for get song info to not go to infinity as decorator
@@ -30,7 +50,6 @@ def limit_recursion(limit):
 
 class SpotipiEinkDisplay:
     def __init__(self, delay=1):
-        signal.signal(signal.SIGTERM, self._handle_sigterm)
         self.delay = delay
         # Configuration for the matrix
         self.config = configparser.ConfigParser()
@@ -38,12 +57,15 @@ class SpotipiEinkDisplay:
         from spotipy.oauth2 import SpotifyOAuth
         import spotipy
 
-        scope = 'user-read-currently-playing,user-modify-playback-state'
+        # one keep-alive session with timeouts for Spotify and the covers
+        self.http = httpPool.session_from_config(self.config)
+        # the library scopes are only used by the pre-warming, tokens without them keep working
+        scope = 'user-read-currently-playing,user-modify-playback-state,user-read-playback-state,user-read-recently-played,user-library-read,playlist-read-private'
         token_cache = self.config.get('DEFAULT', 'token_file')
         self.auth = SpotifyOAuth(scope=scope,
                                  cache_path=token_cache,
-                                 open_browser=False)
-        self.sp   = spotipy.Spotify(auth_manager=self.auth)
+                                 open_browser=False,
+                                 requests_session=self.http)
         # set spotipoy lib logger
         logging.basicConfig(format='%(asctime)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S', filename=self.config.get('DEFAULT', 'spotipy_log'), level=logging.INFO)
         logger = logging.getLogger('spotipy_logger')
@@ -53,20 +75,150 @@ class SpotipiEinkDisplay:
         # prep some vars before entering service loop
         self.song_prev = ''
         self.cycled_this_idle = False
+        # set by a cycle_idle button event, handled by the service loop
+        self.cycle_idle_requested = threading.Event()
         self.pic_counter = 0
         self.song_change_counter = 0 
         self.logger = self._init_logger()
+        # owns the token refresh for this and the button service
+        self.token_broker = tokenBroker.TokenBroker(self.auth,
+                                                    tokenBroker.socket_from_config(self.config),
+                                                    self.logger,
+                                                    refresh_margin=self.config.getfloat('DEFAULT', 'token_refresh_margin_s', fallback=300))
+        self.sp = spotipy.Spotify(auth_manager=self.token_broker, requests_session=self.http)
         self.logger.info('Service instance created')
-        if self.config.get('DEFAULT', 'model') == 'inky':
-            from inky.auto import auto
-            from inky.inky_uc8159 import CLEAN
-            self.inky_auto = auto
-            self.inky_clean = CLEAN
-            self.logger.info('Loading Pimoroni inky lib')
-        if self.config.get('DEFAULT', 'model') == 'waveshare4':
-            from lib import epd4in01f
-            self.wave4 = epd4in01f
-            self.logger.info('Loading Waveshare 4" lib')
+        # per stage timings of every refresh, exported to tmpfs
+        self.stage_timer = StageTimer(self.logger,
+                                      textfile=self.config.get('DEFAULT', 'metrics_textfile', fallback='/dev/shm/spotipi_eink.prom') or None,
+                                      jsonl_file=self.config.get('DEFAULT', 'metrics_jsonl', fallback='/dev/shm/spotipi_eink.jsonl') or None)
+        self._init_render()
+        # decoded covers of recently played albums
+        self.cover_cache = CoverCache(self.config.get('DEFAULT', 'cover_cache_dir', fallback=os.path.join(os.path.dirname(__file__), '..', 'cache', 'covers')),
+                                      max_bytes=self.config.getint('DEFAULT', 'cover_cache_mb', fallback=50) * 1024 * 1024,
+                                      max_px=max(self.config.getint('DEFAULT', 'width'), self.config.getint('DEFAULT', 'height')),
+                                      logger=self.logger)
+        # accent color per album for the label and the background tint
+        self.accents = None
+        if self.accent_color:
+            self.accents = AccentCache(self.config.get('DEFAULT', 'accent_cache_dir', fallback=os.path.join(os.path.dirname(__file__), '..', 'cache', 'accents')),
+                                       max_bytes=self.config.getint('DEFAULT', 'accent_cache_kb', fallback=1024) * 1024,
+                                       pmap=self.palette,
+                                       logger=self.logger)
+        # packed panel frames of recently shown tracks
+        self.frame_cache = FrameCache(self.config.get('DEFAULT', 'frame_cache_dir', fallback=os.path.join(os.path.dirname(__file__), '..', 'cache', 'frames')),
+                                      max_bytes=self.config.getint('DEFAULT', 'frame_cache_mb', fallback=50) * 1024 * 1024,
+                                      logger=self.logger,
+                                      compress=self.config.getboolean('DEFAULT', 'frame_cache_compress', fallback=True))
+        # renders what may play next while the service is idle
+        self.prewarmer = None
+        if self.config.getboolean('DEFAULT', 'prewarm_library', fallback=False):
+            self.prewarmer = LibraryPrewarmer(self.sp,
+                                              render=self._prewarm_track,
+                                              frame_cache=self.frame_cache,
+                                              frame_key=self._frame_key,
+                                              logger=self.logger,
+                                              sources=[s.strip() for s in self.config.get('DEFAULT', 'prewarm_sources', fallback='queue,recent,saved_albums').split(',') if s.strip()],
+                                              playlists=[p.strip() for p in self.config.get('DEFAULT', 'prewarm_playlists', fallback='').split(',') if p.strip()],
+                                              api_calls_per_min=self.config.getfloat('DEFAULT', 'prewarm_api_calls_per_min', fallback=6),
+                                              interval=self.config.getfloat('DEFAULT', 'prewarm_interval_s', fallback=1800),
+                                              cache_share=self.config.getfloat('DEFAULT', 'prewarm_cache_share', fallback=0.5),
+                                              nice=self.config.getint('DEFAULT', 'prewarm_nice', fallback=10))
+        # when to poll currently_playing next
+        self.scheduler = PollScheduler(self.logger,
+                                       min_interval=delay,
+                                       playing_interval=self.config.getfloat('DEFAULT', 'poll_playing_s', fallback=15),
+                                       idle_max_interval=self.config.getfloat('DEFAULT', 'poll_idle_max_s', fallback=30),
+                                       burst_duration=self.config.getfloat('DEFAULT', 'poll_burst_s', fallback=10))
+        # idle images rendered ahead of time
+        self.idle_pool = IdleFramePool(self.config.get('DEFAULT', 'idle_dir', fallback=os.path.join(IMAGES_DIR, 'idle')),
+                                       render=self._render_idle_frame,
+                                       frame_cache=self.frame_cache,
+                                       fingerprint=self.layout_fingerprint,
+                                       target_size=(self.config.getint('DEFAULT', 'width'), self.config.getint('DEFAULT', 'height')),
+                                       logger=self.logger,
+                                       decode_budget_bytes=self.config.getint('DEFAULT', 'idle_decode_budget_mb', fallback=64) * 1024 * 1024)
+        # the panel driver stays initialised between refreshes
+        self.display = DisplaySession(self.config.get('DEFAULT', 'model'),
+                                      self.logger,
+                                      idle_sleep_s=self.config.getfloat('DEFAULT', 'display_idle_sleep_s', fallback=120),
+                                      convert=self._convert_image_wave,
+                                      digest_file=self.config.get('DEFAULT', 'frame_digest_file', fallback=os.path.join(os.path.dirname(__file__), '..', 'config', 'last_frame.digest')))
+        self.stage_timer.export('http_latency_seconds', 'Mean latency of the last requests per host',
+                                lambda: {host: stats['mean'] for host, stats in self.http.latency_stats().items()}, label='host')
+        if self.accents is not None:
+            self.stage_timer.export('accent_extraction_ms', 'Accent extraction time of the last extractions',
+                                    lambda: {stat: value for stat, value in self.accents.cost_stats().items() if stat != 'count'}, label='stat')
+        self.stage_timer.export('panel_refreshes_total', 'Panel refreshes since start',
+                                lambda: self.display.refreshes, kind='counter')
+        self.stage_timer.export('panel_skipped_refreshes_total', 'Refreshes skipped because the panel already showed the frame',
+                                lambda: self.display.skipped_refreshes, kind='counter')
+        self.stage_timer.export('poll_scheduler_total', 'Polls, the reasons of the chosen delays, rate limits and wake-ups since start',
+                                lambda: dict(self.scheduler.counters), kind='counter', label='event')
+        # button presses from buttonActions.py
+        self.events = eventChannel.EventListener(eventChannel.socket_from_config(self.config), self._handle_event, self.logger)
+        # only now everything the handler closes exists, until here SIGTERM just ends the process
+        signal.signal(signal.SIGTERM, self._handle_sigterm)
+
+    def _init_render(self):
+        """render settings shared by the service and headless instances"""
+        # fonts and logo used by _gen_pic
+        font_size_title = self.config.getint('DEFAULT', 'font_size_title', fallback=24)
+        self.assets = AssetRegistry(self.logger,
+                                    font_sizes=(font_size_title, 12, 14, 16),
+                                    logo_heights=(24, font_size_title))
+        self.saturation = self.config.getfloat('DEFAULT', 'saturation', fallback=0.5)
+        self.background_quality = self.config.get('DEFAULT', 'background_quality', fallback='balanced')
+        self.dither_algorithm = self.config.get('DEFAULT', 'dither_algorithm', fallback='pil')
+        if self.dither_algorithm not in ditherEngine.ALGORITHMS:
+            self.logger.warning(f'Unknown dither_algorithm {self.dither_algorithm}, using pil')
+            self.dither_algorithm = 'pil'
+        self.dither_gamma = self.config.getfloat('DEFAULT', 'dither_gamma', fallback=1.0)
+        # nearest panel color lookups for text and accent colors
+        self.palette = palette_map('acep7')
+        self.accent_color = self.config.getboolean('DEFAULT', 'accent_color', fallback=True)
+        self.accent_tint = self.config.getfloat('DEFAULT', 'accent_tint', fallback=0.2)
+        self.layout_fingerprint = FrameCache.fingerprint(
+            FRAME_LAYOUT_VERSION,
+            self.config.get('DEFAULT', 'model'),
+            self.config.getint('DEFAULT', 'width'),
+            self.config.getint('DEFAULT', 'height'),
+            self.config.get('DEFAULT', 'font_path_bold', fallback=None),
+            self.config.get('DEFAULT', 'font_path_regular', fallback=None),
+            self.config.getint('DEFAULT', 'font_size_title', fallback=24),
+            self.config.getint('DEFAULT', 'font_size_artist', fallback=18),
+            self.saturation,
+            self.background_quality,
+            self.dither_algorithm,
+            self.dither_gamma,
+            self.accent_color,
+            self.accent_tint)
+
+    @classmethod
+    def headless(cls, config: configparser.ConfigParser, logger=None, panel: bool = True) -> 'SpotipiEinkDisplay':
+        """an instance that only renders and packs frames, for benchmarks and batch rendering
+
+        It has no Spotify client, caches, sockets or poll loop and never refreshes the panel.
+
+        Args:
+            config (configparser.ConfigParser): eink_options.ini style config
+            logger (optional): logger, defaults to this module's logger
+            panel (bool, optional): load the panel library to pack frames. Defaults to True.
+
+        Returns:
+            SpotipiEinkDisplay: the instance
+        """
+        self = cls.__new__(cls)
+        self.config = config
+        self.logger = logger or logging.getLogger(__name__)
+        self.stage_timer = StageTimer(self.logger)
+        self._init_render()
+        self.accents = None
+        self.prewarmer = None
+        self.display = None
+        if panel:
+            self.display = DisplaySession(self.config.get('DEFAULT', 'model'), self.logger, convert=self._convert_image_wave,
+                                          resolution=(self.config.getint('DEFAULT', 'width'), self.config.getint('DEFAULT', 'height')))
+        return self
 
     def _init_logger(self):
         logger = logging.getLogger(__name__)
@@ -79,8 +231,24 @@ class SpotipiEinkDisplay:
 
     def _handle_sigterm(self, sig, frame):
         self.logger.warning('SIGTERM received stopping')
+        self.events.close()
+        self.token_broker.close()
+        self.display.close()
         sys.exit(0)
 
+    def _handle_event(self, event: dict):
+        """reacts to a button event, runs on the event listener thread
+
+        Args:
+            event (dict): event with its type, see eventChannel.EVENT_TYPES
+        """
+        if event['type'] == 'cycle_idle':
+            self.cycle_idle_requested.set()
+            self.scheduler.wake()
+        else:
+            # skipped or paused, poll right away and keep polling fast until Spotify reflects it
+            self.scheduler.burst()
+
     def _break_fix(self, text: str, width: int, font: ImageFont, draw: ImageDraw):
         """
         Fix line breaks in text.
@@ -148,139 +316,77 @@ class SpotipiEinkDisplay:
         """cleans the display
         """
         try:
-            if self.config.get('DEFAULT', 'model') == 'inky':
-                inky = self.inky_auto()
-                for _ in range(2):
-                    for y in range(inky.height - 1):
-                        for x in range(inky.width - 1):
-                            inky.set_pixel(x, y, self.inky_clean)
-
-                    inky.show()
-                    time.sleep(1.0)
-            if self.config.get('DEFAULT', 'model') == 'waveshare4':
-                epd = self.wave4.EPD()
-                epd.init()
-                epd.Clear()
+            self.display.clean()
         except Exception as e:
             self.logger.error(f'Display clean error: {e}')
             self.logger.error(traceback.format_exc())
 
     def _convert_image_wave(self, img: Image, saturation: int = 2) -> Image:
-        # blow out the saturation
-        converter = ImageEnhance.Color(img)
-        img = converter.enhance(saturation)
-        # dither to 7-color palette
-        palette_data = [0x00, 0x00, 0x00,
-                        0xff, 0xff, 0xff,
-                        0x00, 0xff, 0x00,
-                        0x00, 0x00, 0xff,
-                        0xff, 0x00, 0x00,
-                        0xff, 0xff, 0x00,
-                        0xff, 0x80, 0x00]
-        # Image size doesn't matter since it's just the palette we're using
-        palette_image = Image.new('P', (1, 1))
-        # Set our 7 color palette (+ clear) and zero out the other 247 colors
-        palette_image.putpalette(palette_data + [0, 0, 0] * 248)
-        # Force source image and palette data to be loaded for `.im` to work
-        img.load()
-        palette_image.load()
-        im = img.im.convert('P', True, palette_image.im)
-        # create the new 7 color image and return it
-        return img._new(im)
-
-    def _display_image(self, image: Image, saturation: float = 0.5):
-        """displays a image on the inky display
+        # blow out the saturation and dither to the 7-color palette
+        with self.stage_timer.span('quantize'):
+            return ditherEngine.dither(img, palette='acep7', algorithm=self.dither_algorithm,
+                                       saturation=saturation, gamma=self.dither_gamma)
+
+    def _pack_image(self, image: Image) -> Optional[bytes]:
+        """converts a rendered image into the packed panel frame buffer
 
         Args:
-            image (Image): Image to display
-            saturation (float, optional): saturation. Defaults to 0.5.
+            image (Image): Image to pack
+
+        Returns:
+            Optional[bytes]: frame buffer or None on error
         """
         try:
-            if self.config.get('DEFAULT', 'model') == 'inky':
-                inky = self.inky_auto()
-                inky.set_image(image, saturation=saturation)
-                inky.show()
-            if self.config.get('DEFAULT', 'model') == 'waveshare4':
-                epd = self.wave4.EPD()
-                epd.init()
-                epd.display(epd.getbuffer(self._convert_image_wave(image)))
-                epd.sleep()
+            with self.stage_timer.span('pack'):
+                return self.display.pack(image, saturation=self.saturation)
         except Exception as e:
             self.logger.error(f'Display image error: {e}')
             self.logger.error(traceback.format_exc())
+        return None
 
-    def _gen_pic(self, image: Optional[Image], artist: str, title: str, duration_ms: Optional[int], progress_ms: Optional[int], is_playing: bool) -> Image:
-        import os
-        from PIL import ImageDraw, ImageFont
-        import textwrap
+    def _display_frame(self, buffer: bytes) -> bool:
+        """displays a packed frame buffer on the display
+
+        Args:
+            buffer (bytes): frame buffer from _pack_image
+
+        Returns:
+            bool: True if the panel was refreshed, False if skipped or failed
+        """
         try:
-            from colorthief import ColorThief
-            import io
-        except ImportError:
-            ColorThief = None
+            shown = self.display.show(buffer)
+            if shown:
+                for stage, seconds in self.display.last_timings.items():
+                    self.stage_timer.add(stage, seconds)
+            return shown
+        except Exception as e:
+            self.logger.error(f'Display image error: {e}')
+            self.logger.error(traceback.format_exc())
+        return False
+
+    def _frame_key(self, song_request: list) -> str:
+        """frame cache key of a song, everything that ends up on the glass"""
+        return self.layout_fingerprint + '|' + '\x1f'.join(song_request[:3])
+
+    def _gen_pic(self, image: Optional[Image], artist: str, title: str, duration_ms: Optional[int], progress_ms: Optional[int], is_playing: bool, accent: Optional[tuple] = None) -> Image:
+        from PIL import ImageDraw
+        import textwrap
 
         target_w = self.config.getint('DEFAULT', 'width')
         target_h = self.config.getint('DEFAULT', 'height')
 
-        PALETTE = {
-            "black": (0, 0, 0), "white": (255, 255, 255), "green": (0, 255, 0),
-            "blue": (0, 0, 255), "red": (255, 0, 0), "yellow": (255, 255, 0),
-            "orange": (255, 128, 0)
-        }
-
-        def get_closest_color(rgb_tuple, palette):
-            if not rgb_tuple: return palette["black"]
-            min_dist = float('inf')
-            closest_color_val = palette["black"]
-            for color_rgb in palette.values():
-                dist = sum([(a - b) ** 2 for a, b in zip(rgb_tuple, color_rgb)]) ** 0.5
-                if dist < min_dist:
-                    min_dist = dist
-                    closest_color_val = color_rgb
-            return closest_color_val
-
-        bg_color = PALETTE["black"]
-        if is_playing and image:
-            bg_img = image.copy().convert("RGB")
-
-            # ▶ preserve aspect ratio: zoom & center‑crop in one step
-            bg_img = ImageOps.fit(
-                bg_img,
-                (target_w, target_h),
-                method=Image.Resampling.LANCZOS,
-                centering=(0.5, 0.5),
-            )
-
-            # Apply blur
-            bg_img = bg_img.filter(ImageFilter.GaussianBlur(radius=15))
-            # Reduce brightness
-            enhancer = ImageEnhance.Brightness(bg_img)
-            bg_img = enhancer.enhance(0.8)  # 0.8 = 80% brightness
-            img_new = bg_img
+        bg_color = BLACK
+        if image:
+            # zoom & center-crop, blur and darken the cover as background
+            with self.stage_timer.span('background'):
+                img_new = blurred_background(image, (target_w, target_h), tier=self.background_quality,
+                                             tint=accent, tint_strength=self.accent_tint)
         else:
-            if image:
-                bg_img = image.copy().convert("RGB")
-
-                # ▶ preserve aspect ratio: zoom & center‑crop in one step
-                bg_img = ImageOps.fit(
-                    bg_img,
-                    (target_w, target_h),
-                    method=Image.Resampling.LANCZOS,
-                    centering=(0.5, 0.5),
-                )
-
-                # Blur
-                bg_img = bg_img.filter(ImageFilter.GaussianBlur(radius=15))
-
-                # Darken
-                enhancer = ImageEnhance.Brightness(bg_img)
-                img_new = enhancer.enhance(0.8)
-            else:
-                img_new = Image.new('RGB', (target_w, target_h), PALETTE["black"])
+            img_new = Image.new('RGB', (target_w, target_h), bg_color)
 
         draw = ImageDraw.Draw(img_new)
 
-        art_size = int(min(target_w // 2, target_h - 100)*0.9)
+        art_size = self._art_size()
         art_y = (target_h - art_size) // 2
         art_x = art_y
 
@@ -302,35 +408,13 @@ class SpotipiEinkDisplay:
 
 
         else:
-            placeholder_color = PALETTE["white"] if bg_color == PALETTE["black"] else PALETTE["black"]
+            placeholder_color = self.palette.contrast(bg_color)
             draw.rounded_rectangle([(art_x, art_y), (art_x + art_size, art_y + art_size)], outline=placeholder_color, radius=20, width=2)
 
-        try:
-            font_dir = os.path.join(os.path.dirname(__file__), '..', 'resources')
-            font_path_bold = self.config.get('DEFAULT', 'font_path_bold', fallback=os.path.join(font_dir, 'CircularStd-Bold.otf'))
-            font_path_regular = self.config.get('DEFAULT', 'font_path_regular', fallback=font_path_bold)
-            font_path_unicode = os.path.join(font_dir, 'NotoSans-Regular.ttf')
-            font_size_title = self.config.getint('DEFAULT', 'font_size_title', fallback=24)
-            font_size_artist = self.config.getint('DEFAULT', 'font_size_artist', fallback=18)
-
-            font_title = ImageFont.truetype(font_path_unicode, font_size_title)
-            #try:
-            #    font_title = ImageFont.truetype(font_path_bold, font_size_title)
-            #except:
-            #    font_title = ImageFont.truetype(font_path_unicode, font_size_title)
-
-            font_artist = ImageFont.truetype(font_path_unicode, font_size_artist)
-            #try:
-            #    font_artist = ImageFont.truetype(font_path_regular, font_size_artist)
-            #except:
-            #    font_artist = ImageFont.truetype(font_path_unicode, font_size_artist)
-
-        except Exception as e:
-            self.logger.error(f"Font loading error: {e}, using default.")
-            font_title = ImageFont.load_default()
-            font_artist = ImageFont.load_default()
+        font_size_title = self.config.getint('DEFAULT', 'font_size_title', fallback=24)
+        font_title = self.assets.font(font_size_title)
 
-        text_color = PALETTE["white"] if bg_color == PALETTE["black"] else PALETTE["black"]
+        text_color = self.palette.contrast(bg_color)
 
         if is_playing:
             text_start_x = art_x + art_size + 20
@@ -340,17 +424,8 @@ class SpotipiEinkDisplay:
             label_font_size = 12
             artist_font_size = 14
 
-            font_label = ImageFont.truetype(font_path_unicode, label_font_size)
-            #try:
-            #    font_label = ImageFont.truetype(font_path_bold, label_font_size)
-            #except:
-            #    font_label = ImageFont.truetype(font_path_unicode, label_font_size)
-
-            font_artist_small = ImageFont.truetype(font_path_unicode, artist_font_size)
-            #try:
-            #    font_artist_small = ImageFont.truetype(font_path_regular, artist_font_size)
-            #except:
-            #    font_artist_small = ImageFont.truetype(font_path_unicode, artist_font_size)
+            font_label = self.assets.font(label_font_size)
+            font_artist_small = self.assets.font(artist_font_size)
 
 
             # Prepare wrapped lines
@@ -370,8 +445,11 @@ class SpotipiEinkDisplay:
             # Center vertically
             current_y = art_y + (art_size - total_height) // 2
 
-            # Draw label
-            draw.text((text_start_x, current_y), "SONG", font=font_label, fill=text_color)
+            # Draw label, the accent only if it stands out on the background behind it, which is tinted towards it
+            label_box = draw.textbbox((text_start_x, current_y), "SONG", font=font_label)
+            label_bg = tuple(ImageStat.Stat(img_new.crop(label_box)).mean[:3])
+            label_color = accent if accent and self.palette.readable(accent, label_bg) else text_color
+            draw.text((text_start_x, current_y), "SONG", font=font_label, fill=label_color)
             current_y += label_font_size + spacing
 
             # Title
@@ -386,18 +464,12 @@ class SpotipiEinkDisplay:
                 draw.text((text_start_x, current_y), line, font=font_artist_small, fill=text_color)
                 current_y += artist_font_size + spacing
             # Draw Spotify logo bottom-right
-            try:
-                logo_path = os.path.expanduser('~/spotipi-eink/images/spotify_logo.png')
-                logo_img = Image.open(logo_path).convert("RGBA")
-                logo_height = 24
-                logo_ratio = logo_img.width / logo_img.height
-                logo_resized = logo_img.resize((int(logo_height * logo_ratio), logo_height), Image.Resampling.LANCZOS)
-
+            logo_height = 24
+            logo_resized = self.assets.logo(logo_height)
+            if logo_resized:
                 logo_x = target_w - logo_resized.width - 20
                 logo_y = target_h - logo_height - 20
                 img_new.paste(logo_resized, (logo_x, logo_y), logo_resized)
-            except Exception as e:
-                self.logger.warning(f"Could not draw Spotify logo: {e}")
 
 
         else:
@@ -409,23 +481,16 @@ class SpotipiEinkDisplay:
 
 
             idle_font = font_title
-            label_font = ImageFont.truetype(font_path_unicode, 16)
-            #try:
-            #    label_font = ImageFont.truetype(font_path_bold, 16)
-            #except:
-            #    label_font = ImageFont.truetype(font_path_unicode, 16)
+            label_font = self.assets.font(16)
 
 
             # Measure text
             idle_bbox = draw.textbbox((0, 0), idle_text, font=idle_font)
             label_bbox = draw.textbbox((0, 0), label_text, font=label_font)
 
-            # Load and resize logo
-            logo_path = os.path.expanduser('~/spotipi-eink/images/spotify_logo.png')
-            logo_img = Image.open(logo_path).convert("RGBA")
+            # Pre-scaled logo
             logo_height = font_size_title
-            logo_ratio = logo_img.width / logo_img.height
-            logo_resized = logo_img.resize((int(logo_height * logo_ratio), logo_height), Image.Resampling.LANCZOS)
+            logo_resized = self.assets.logo(logo_height)
 
             # Positioning
             total_block_height = idle_bbox[3] - idle_bbox[1] + 24 + logo_height
@@ -438,7 +503,7 @@ class SpotipiEinkDisplay:
 
             # Draw "LISTEN ON" + logo below
             label_w = label_bbox[2] - label_bbox[0]
-            logo_w = logo_resized.width
+            logo_w = logo_resized.width if logo_resized else 0
             padding = 10
             combo_w = label_w + padding + logo_w
 
@@ -446,140 +511,298 @@ class SpotipiEinkDisplay:
             label_y = start_y + (idle_bbox[3] - idle_bbox[1]) + 24
 
             draw.text((label_x, label_y + (logo_height - (label_bbox[3] - label_bbox[1])) // 2), label_text, font=label_font, fill=text_color)
-            img_new.paste(logo_resized, (label_x + label_w + padding, label_y), logo_resized)
+            if logo_resized:
+                img_new.paste(logo_resized, (label_x + label_w + padding, label_y), logo_resized)
 
         return img_new
 
 
-    def _display_update_process(self, song_request: list):
-        """Display update process that jude by the song_request list if a song is playing and we need to download the album cover or not
+    def _render_idle_frame(self, idle_img: Image) -> Optional[bytes]:
+        """renders and packs the idle frame for an idle image"""
+        return self._pack_image(self._gen_pic(
+            idle_img,
+            artist="",
+            title="",
+            duration_ms=None,
+            progress_ms=None,
+            is_playing=False
+        ))
+
+    def _art_size(self) -> int:
+        """edge length of the album art square in the playing layout"""
+        return int(min(self.config.getint('DEFAULT', 'width') // 2, self.config.getint('DEFAULT', 'height') - 100)*0.9)
+
+    def _cover_px_needed(self) -> int:
+        """smallest cover edge that renders without visible upscaling
+
+        The album art square is drawn 1:1. The background is blurred with a
+        15px radius, so half the panel resolution is plenty for it.
+        """
+        return max(self._art_size(), max(self.config.getint('DEFAULT', 'width'), self.config.getint('DEFAULT', 'height')) // 2)
+
+    def _select_cover_url(self, images: list, fallback: str) -> str:
+        """pick the smallest Spotify image variant that still covers _cover_px_needed
 
         Args:
-            song_request (list): song_request list
-            config (configparser.ConfigParser): config object
-            pic_counter (int): picture refresh counter
+            images (list): album images from the Web API, dicts with url, width and height
+            fallback (str): url to use if images carries no sizes
 
         Returns:
-            int: updated picture refresh counter
+            str: cover image url
         """
-        if song_request:
-            # download cover
-            try:
-                resp = requests.get(song_request[1], stream=True)
+        needed = self._cover_px_needed()
+        sized = sorted((img for img in images if img.get('width') and img.get('height')), key=lambda img: img['width'])
+        for img in sized:
+            if min(img['width'], img['height']) >= needed:
+                return img['url']
+        return sized[-1]['url'] if sized else fallback
+
+    def _decode_cover(self, data: bytes) -> Image:
+        """decode a cover, JPEGs with DCT scaling straight to the size the layout needs"""
+        cover = Image.open(io.BytesIO(data))
+        needed = self._cover_px_needed()
+        cover.draft('RGB', (needed, needed))
+        return cover.convert("RGB")
+
+    def _get_cover(self, url: str) -> Optional[Image]:
+        """return the album cover from the cover cache, downloading it on a miss
+
+        JPEGs are decoded with DCT scaling straight to the size the layout needs.
+
+        Args:
+            url (str): cover image url
+
+        Returns:
+            Optional[Image]: cover image or None if it could not be downloaded
+        """
+        if not url:
+            return None
+        with self.stage_timer.span('cover_cache'):
+            cover = self.cover_cache.get(url)
+        if cover is not None:
+            self.logger.info(f'Cover cache hit ({self.cover_cache.hits} hits, {self.cover_cache.misses} misses)')
+            return cover
+        # download cover
+        try:
+            with self.stage_timer.span('cover_download'):
+                resp = self.http.get(url)
                 resp.raise_for_status()
-                cover = Image.open(resp.raw).convert("RGB")
-            except Exception as e:
-                self.logger.error(f"Error downloading cover: {e}")
-                cover = None
+            with self.stage_timer.span('cover_decode'):
+                cover = self._decode_cover(resp.content)
+        except Exception as e:
+            self.logger.error(f"Error downloading cover: {e}")
+            return None
+        return self.cover_cache.put(url, cover)
 
+    def _render_track(self, song_request: list, cover: Optional[Image]) -> tuple:
+        """renders and packs the frame of a track
+
+        Args:
+            song_request (list): song_request list
+            cover (Image, optional): album cover, None for the placeholder
+
+        Returns:
+            tuple: rendered image and packed frame buffer, None on error
+        """
+        accent = None
+        if cover is not None and self.accents is not None:
+            with self.stage_timer.span('accent'):
+                accent = self.accents.get(song_request[6] or song_request[1], cover)
+        with self.stage_timer.span('gen_pic'):
             image = self._gen_pic(
                 cover,
                 artist=song_request[2],
                 title=song_request[0],
                 duration_ms=None,
                 progress_ms=None,
-                is_playing=True
+                is_playing=True,
+                accent=accent
             )
-        else:
-            # not song playing use logo
-            import random
-
-            idle_dir = os.path.expanduser('~/spotipi-eink/images/idle')
-            idle_files = [f for f in os.listdir(idle_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-            idle_img = None
-            if idle_files:
-                selected = random.choice(idle_files)
-                try:
-                    idle_img = Image.open(os.path.join(idle_dir, selected)).convert("RGB")
-                except:
-                    idle_img = None
+        return image, self._pack_image(image)
 
+    def _prewarm_track(self, song_request: list) -> bool:
+        """renders a track that may play soon into the frame cache, runs on the pre-warming thread
 
-            image = self._gen_pic(
-                idle_img,
-                artist="",
-                title="",
-                duration_ms=None,
-                progress_ms=None,
-                is_playing=False
-            )
+        The cover is not added to the cover cache, a library walk would evict
+        the covers of what actually played.
 
-        # clean screen every x pics
-        if self.pic_counter > self.config.getint('DEFAULT', 'display_refresh_counter'):
-            self._display_clean()
-            self.pic_counter = 0
-        # display picture on display
-        self._display_image(image)
-        image.save("test_output.png")
-        self.pic_counter += 1
+        Args:
+            song_request (list): song_request list
+
+        Returns:
+            bool: True if a frame was stored
+        """
+        url = self._select_cover_url(song_request[5], song_request[1])
+        if not url:
+            return False
+        # a peek does not count as a cover cache hit or miss of the service
+        cover = self.cover_cache.get(url, peek=True)
+        if cover is None:
+            try:
+                resp = self.http.get(url)
+                resp.raise_for_status()
+                # shrunk like a cover cache entry, so the frame matches the one rendered on a track change
+                cover = CoverCache.shrink(self._decode_cover(resp.content), self.cover_cache.max_px)
+            except Exception as e:
+                self.logger.warning(f'Could not pre-warm cover: {e}')
+                return False
+        _, buffer = self._render_track(song_request, cover)
+        if buffer is None:
+            return False
+        return self.frame_cache.put(self._frame_key(song_request), buffer)
+
+    def _foreground(self):
+        """context in which the library pre-warming waits"""
+        return self.prewarmer.hold() if self.prewarmer else contextlib.nullcontext()
+
+    def _display_update_process(self, song_request: list, track_started: Optional[float] = None):
+        """Display update process that jude by the song_request list if a song is playing and we need to download the album cover or not
+
+        Args:
+            song_request (list): song_request list
+            track_started (float, optional): estimated wall clock time the track started, for the track change latency
+        """
+        # the library pre-warming waits until the frame is rendered and on the glass
+        with self._foreground():
+            image = None
+            if song_request:
+                frame_key = self._frame_key(song_request)
+                with self.stage_timer.span('frame_cache'):
+                    buffer = self.frame_cache.get(frame_key)
+                if buffer is not None:
+                    self.logger.info(f'Frame cache hit ({self.frame_cache.hits} hits, {self.frame_cache.misses} misses)')
+                else:
+                    cover = self._get_cover(self._select_cover_url(song_request[5], song_request[1]))
+                    image, buffer = self._render_track(song_request, cover)
+                    # frames with the placeholder instead of a cover are not kept
+                    if cover is not None and buffer is not None:
+                        self.frame_cache.put(frame_key, buffer)
+            else:
+                # not song playing, use a pre-rendered idle image
+                with self.stage_timer.span('idle_pick'):
+                    buffer = self.idle_pool.pick()
+                if buffer is None:
+                    with self.stage_timer.span('gen_pic'):
+                        image = self._gen_pic(
+                            None,
+                            artist="",
+                            title="",
+                            duration_ms=None,
+                            progress_ms=None,
+                            is_playing=False
+                        )
+                    buffer = self._pack_image(image)
+
+            # clean screen every x pics
+            if self.pic_counter > self.config.getint('DEFAULT', 'display_refresh_counter'):
+                with self.stage_timer.span('clean'):
+                    self._display_clean()
+                self.pic_counter = 0
+            # display picture on display, identical frames are skipped
+            if buffer is not None and self._display_frame(buffer):
+                self.pic_counter += 1
+                if track_started is not None:
+                    self.stage_timer.track_change(time.time() - track_started)
+            if image is not None:
+                with self.stage_timer.span('debug_png'):
+                    image.save("test_output.png")
 
     @limit_recursion(limit=10)
-    def _get_song_info(self) -> list:
-        """get the current played song from Spotify's Web API"""
+    def _get_song_info(self) -> Optional[list]:
+        """get the current played song from Spotify's Web API
+
+        Returns:
+            Optional[list]: [title, cover url, artist, progress_ms, duration_ms, images, album id],
+            an empty list if nothing is playing or None if the state is unknown.
+            cover url is the largest image, images all variants Spotify offers,
+            album id is the show id for podcast episodes
+        """
         try:
             # try the cached client first
             result = self.sp.currently_playing(additional_types='episode')
         except Exception as e:
-            self.logger.warning(f"Cached Spotify client failed ({e}), falling back to cache_file auth")
-            # fallback to old util.prompt_for_user_token (uses cache_file)
-            from spotipy.util import prompt_for_user_token
-            token = prompt_for_user_token(
-                username=self.config.get('DEFAULT','username'),
-                scope='user-read-currently-playing,user-modify-playback-state',
-                cache_path=self.config.get('DEFAULT','token_file')
-            )
-            if not token:
-                self.logger.error("Fallback auth failed, skipping song info")
-                return []
-            import spotipy
-            self.sp = spotipy.Spotify(auth=token)
-            # retry once
-            try:
-                result = self.sp.currently_playing(additional_types='episode')
-            except Exception as e2:
-                self.logger.error(f"Retry after fallback also failed ({e2})")
-                return []
-
-        if not result:
+            if getattr(e, 'http_status', None) == 429:
+                headers = getattr(e, 'headers', None) or {}
+                self.scheduler.rate_limited(float(headers.get('Retry-After', 5)))
+                return None
+            if getattr(e, 'http_status', None) == 401:
+                # token rejected, refresh in the background and try again on the next poll
+                self.token_broker.request_refresh()
+            self.logger.warning(f"Spotify currently_playing failed ({e})")
+            return None
+
+        if not result or not result.get('is_playing') or not result.get('item'):
             return []
+        song_request = song_from_item(result['item'])
+        song_request[3] = result.get('progress_ms')
+        return song_request
+
+    def _poll_pass(self):
+        """one pass of the service loop: poll, then render and refresh if the display has to change"""
+        with self.stage_timer.trace('poll') as trace:
+            with self.stage_timer.span('poll'):
+                song_request = self._get_song_info()
+            if song_request is None:
+                # playback state unknown, keep what is on the display
+                return
+            self.scheduler.observe(song_request)
+            if self.prewarmer:
+                # the library is only walked while nothing plays
+                self.prewarmer.playback(bool(song_request))
+            trace['kind'] = 'track' if song_request else 'idle'
+            if not song_request and self.cycle_idle_requested.is_set():
+                self.cycle_idle_requested.clear()
+                # only cycle once per idle session
+                if not self.cycled_this_idle:
+                    self._display_update_process(song_request=[])
+                    self.song_prev = 'NO_SONG'
+                    self.cycled_this_idle = True
+                return
+            if song_request:
+                # cycling idle images only applies while nothing plays
+                self.cycle_idle_requested.clear()
+                if self.song_prev != song_request[0] + song_request[1]:
+                    self.cycled_this_idle = False
+                    self.song_prev = song_request[0] + song_request[1]
+                    # a track that started a moment ago is a track change, not a service start or a seek
+                    progress_ms = song_request[3]
+                    track_started = time.time() - progress_ms / 1000 if progress_ms is not None and progress_ms < 60000 else None
+                    self._display_update_process(song_request=song_request, track_started=track_started)
+            #CONSTANT UPDATES FOR TESTING
+            #self._display_update_process(song_request=song_request if song_request else [])
+            #self.song_prev = song_request[0] + song_request[1] if song_request else 'NO_SONG'
+
+            if not song_request:
+                if self.song_prev != 'NO_SONG':
+                    # set fake song name to update only once if no song is playing.
+                    self.song_prev = 'NO_SONG'
+                    self._display_update_process(song_request=song_request)
 
     def start(self):
         self.logger.info('Service started')
-        # clean screen initially
-        self._display_clean()
+        self.token_broker.start()
+        self.events.start()
+        # start rendering the idle images in the background
+        self.idle_pool.refresh()
+        if self.prewarmer:
+            self.prewarmer.start()
+        # clean screen initially, unless the glass still shows a known frame
+        if self.display.frame_digest is None:
+            self._display_clean()
         try:
             while True:
                 try:
-                    song_request = self._get_song_info()
-                    flag = '/home/stavri/spotipi-eink/python/spotipi_cycle_idle'
-                    if not song_request and os.path.exists(flag):
-                        os.remove(flag)
-                        # only cycle once per idle session
-                        if not self.cycled_this_idle:
-                            self._display_update_process(song_request=[])
-                            self.song_prev = 'NO_SONG'
-                            self.cycled_this_idle = True
-                        continue
-                    if song_request:
-                        if self.song_prev != song_request[0] + song_request[1]:
-                            self.cycled_this_idle = False
-                            self.song_prev = song_request[0] + song_request[1]
-                            self._display_update_process(song_request=song_request)
-                    #CONSTANT UPDATES FOR TESTING
-                    #self._display_update_process(song_request=song_request if song_request else [])
-                    #self.song_prev = song_request[0] + song_request[1] if song_request else 'NO_SONG'
-
-                    if not song_request:
-                        if self.song_prev != 'NO_SONG':
-                            # set fake song name to update only once if no song is playing.
-                            self.song_prev = 'NO_SONG'
-                            self._display_update_process(song_request=song_request)
+                    self._poll_pass()
                 except Exception as e:
                     self.logger.error(f'Error: {e}')
                     self.logger.error(traceback.format_exc())
-                time.sleep(self.delay)
+                # not in a finally, a stop (SIGINT) must not wait for the next poll
+                self.scheduler.wait()
         except KeyboardInterrupt:
             self.logger.info('Service stopping')
+            self.events.close()
+            self.token_broker.close()
+            self.display.close()
             sys.exit(0)
 
 
@@ -0,0 +1,178 @@
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def percentile(samples, q: float) -> float:
+    """Nearest-rank percentile of a non-empty sample"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+class StageTimer:
+    """Per-refresh latency breakdown with rolling percentiles.
+
+    trace() brackets one pass of the service loop. Stages timed with span()
+    or reported with add() while it is open become that pass's breakdown;
+    spans on other threads (e.g. idle pre-rendering) only feed the rolling
+    statistics. Spans may nest (quantize is part of pack), so the stages of
+    a pass can add up to more than its total. Every pass that did more than
+    poll is appended to a JSON lines file, and the rolling percentiles of
+    every stage and of the track-change-to-glass latency are rewritten to a
+    Prometheus textfile. The values other components add with export() go
+    into both. Both files are meant for tmpfs.
+    """
+
+    def __init__(self, logger, textfile: Optional[str] = None, jsonl_file: Optional[str] = None,
+                 window: int = 100, jsonl_max_bytes: int = 1024 * 1024):
+        """
+        Args:
+            logger: service logger
+            textfile (str, optional): Prometheus textfile path, None to disable
+            jsonl_file (str, optional): JSON lines path, None to disable
+            window (int, optional): samples kept per stage for the percentiles
+            jsonl_max_bytes (int, optional): the JSON lines file is rotated to .1 beyond this
+        """
+        self.logger = logger
+        self.textfile = textfile
+        self.jsonl_file = jsonl_file
+        self.window = window
+        self.jsonl_max_bytes = jsonl_max_bytes
+        self.traces = 0
+        self._samples = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+        self._track_change = collections.deque(maxlen=window)
+        # name -> [count, sum] since start, Prometheus wants these cumulative
+        self._totals = collections.defaultdict(lambda: [0, 0.0])
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # name -> (help, type, label, collect) of values owned by other components
+        self._exports = {}
+
+    @contextlib.contextmanager
+    def trace(self, kind: str):
+        """Bracket one pass of the service loop"""
+        trace = {'kind': kind, 'time': time.time(), 'stages': {}}
+        self._local.trace = trace
+        start = time.perf_counter()
+        try:
+            yield trace
+        finally:
+            self._local.trace = None
+            trace['total_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            if set(trace['stages']) - {'poll'}:
+                self._finish(trace)
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        """Time a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        """Record a stage duration measured elsewhere, e.g. by the panel driver"""
+        with self._lock:
+            self._samples[name].append(seconds)
+            self._totals[name][0] += 1
+            self._totals[name][1] += seconds
+        trace = getattr(self._local, 'trace', None)
+        if trace is not None:
+            stages = trace['stages']
+            stages[name] = round(stages.get(name, 0) + seconds * 1000, 2)
+
+    def track_change(self, seconds: float):
+        """Record the time from a track change to its frame being on the glass"""
+        with self._lock:
+            self._track_change.append(seconds)
+            self._totals['track_change_to_glass'][0] += 1
+            self._totals['track_change_to_glass'][1] += seconds
+        self.logger.info(f'Track change to glass in {seconds:.1f}s')
+
+    def export(self, name: str, help_text: str, collect, kind: str = 'gauge', label: Optional[str] = None):
+        """Add a value owned elsewhere to the Prometheus textfile
+
+        Args:
+            name (str): metric name without the spotipi_ prefix
+            help_text (str): HELP line
+            collect (callable): () -> number, or label value -> number if label is set
+            kind (str, optional): gauge or counter
+            label (str, optional): label name of the values collect returns
+        """
+        self._exports[name] = (help_text, kind, label, collect)
+
+    def percentiles(self) -> dict:
+        """stage -> {quantile: seconds of the kept samples, 'count' and 'sum' since start}"""
+        with self._lock:
+            series = dict(self._samples)
+            series['track_change_to_glass'] = self._track_change
+            series = {name: list(samples) for name, samples in series.items() if samples}
+            totals = {name: tuple(total) for name, total in self._totals.items()}
+        return {name: dict({q: percentile(samples, q) for q in QUANTILES}, count=totals[name][0], sum=totals[name][1])
+                for name, samples in series.items()}
+
+    def _collect(self) -> dict:
+        """name -> current value of every export() that could be collected"""
+        values = {}
+        for name, (_, _, _, collect) in sorted(self._exports.items()):
+            try:
+                values[name] = collect()
+            except Exception as e:
+                self.logger.warning(f'Could not collect {name}: {e}')
+        return values
+
+    def _finish(self, trace: dict):
+        self.traces += 1
+        self.logger.info(f'Refresh breakdown ({trace["total_ms"]:.0f}ms): '
+                         + ', '.join(f'{name} {ms:.0f}ms' for name, ms in trace['stages'].items()))
+        exports = self._collect() if self._exports else {}
+        try:
+            if self.jsonl_file:
+                self._append_jsonl(dict(trace, exports=exports) if exports else trace)
+            if self.textfile:
+                self._write_textfile(exports)
+        except OSError as e:
+            self.logger.warning(f'Could not export metrics: {e}')
+
+    def _append_jsonl(self, trace: dict):
+        if os.path.exists(self.jsonl_file) and os.path.getsize(self.jsonl_file) > self.jsonl_max_bytes:
+            os.replace(self.jsonl_file, self.jsonl_file + '.1')
+        with open(self.jsonl_file, 'a') as f:
+            f.write(json.dumps(trace) + '\n')
+
+    def _write_textfile(self, exports: dict):
+        lines = ['# HELP spotipi_stage_seconds Rolling duration of the refresh stages',
+                 '# TYPE spotipi_stage_seconds summary']
+        stats = self.percentiles()
+        track_change = stats.pop('track_change_to_glass', None)
+        for name, stat in sorted(stats.items()):
+            lines += [f'spotipi_stage_seconds{{stage="{name}",quantile="{q}"}} {stat[q]:.6f}' for q in QUANTILES]
+            lines += [f'spotipi_stage_seconds_sum{{stage="{name}"}} {stat["sum"]:.6f}',
+                      f'spotipi_stage_seconds_count{{stage="{name}"}} {stat["count"]}']
+        if track_change:
+            lines += ['# HELP spotipi_track_change_to_glass_seconds Rolling time from a track change to its frame on the panel',
+                      '# TYPE spotipi_track_change_to_glass_seconds summary']
+            lines += [f'spotipi_track_change_to_glass_seconds{{quantile="{q}"}} {track_change[q]:.6f}' for q in QUANTILES]
+            lines += [f'spotipi_track_change_to_glass_seconds_sum {track_change["sum"]:.6f}',
+                      f'spotipi_track_change_to_glass_seconds_count {track_change["count"]}']
+        for name, values in exports.items():
+            help_text, kind, label, _ = self._exports[name]
+            lines += [f'# HELP spotipi_{name} {help_text}', f'# TYPE spotipi_{name} {kind}']
+            if label is None:
+                lines.append(f'spotipi_{name} {values}')
+            else:
+                lines += [f'spotipi_{name}{{{label}="{key}"}} {value}' for key, value in sorted(values.items())]
+        lines += ['# HELP spotipi_refreshes_total Service loop passes that rendered or refreshed',
+                  '# TYPE spotipi_refreshes_total counter',
+                  f'spotipi_refreshes_total {self.traces}']
+        tmp_file = self.textfile + '.tmp'
+        with open(tmp_file, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_file, self.textfile)
@@ -0,0 +1,195 @@
+import json
+import os
+import socket
+import threading
+import time
+from typing import Optional
+
+DEFAULT_SOCKET = '/tmp/spotipi-eink-token.sock'
+
+
+def socket_from_config(config) -> str:
+    """Path of the token socket from eink_options.ini"""
+    return config.get('DEFAULT', 'token_socket', fallback=DEFAULT_SOCKET)
+
+
+class TokenBroker:
+    """The one owner of the Spotify access token.
+
+    The display service runs the broker. It refreshes the token in the
+    background refresh_margin seconds before it expires, so no API call
+    ever waits for a refresh, and it is the only writer of the token file.
+    Other processes get the current token from its Unix socket through
+    BrokerClient. In-process it is the spotipy auth manager itself.
+    """
+
+    def __init__(self, auth, socket_path: str, logger, refresh_margin: float = 300, retry_interval: float = 30):
+        """
+        Args:
+            auth (SpotifyOAuth): oauth manager owning the token file
+            socket_path (str): socket path, a stale socket file is replaced
+            logger: service logger
+            refresh_margin (float, optional): seconds before expiry to refresh
+            retry_interval (float, optional): seconds between failed refresh attempts
+        """
+        self.auth = auth
+        self.socket_path = socket_path
+        self.logger = logger
+        self.refresh_margin = refresh_margin
+        self.retry_interval = retry_interval
+        self.refreshes = 0
+        self._token_info: Optional[dict] = None
+        self._lock = threading.Lock()
+        self._refresh_requested = threading.Event()
+        self._sock: Optional[socket.socket] = None
+
+    def start(self):
+        """Load the cached token, then refresh and serve it in the background"""
+        self._token_info = self.auth.cache_handler.get_cached_token()
+        if self._token_info is None:
+            self.logger.error('No cached Spotify token, run the setup authorisation first')
+        elif self._expires_in() < 60:
+            # the only refresh on the hot path, before the first poll
+            self._refresh()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.socket_path)
+        # the token is as secret as the token file
+        os.chmod(self.socket_path, 0o600)
+        self._sock.listen(4)
+        threading.Thread(target=self._serve, name='token-broker', daemon=True).start()
+        threading.Thread(target=self._refresh_loop, name='token-refresh', daemon=True).start()
+
+    def _expires_in(self) -> float:
+        with self._lock:
+            if self._token_info is None:
+                return 0
+            return self._token_info['expires_at'] - time.time()
+
+    def _refresh(self) -> bool:
+        with self._lock:
+            refresh_token = self._token_info and self._token_info.get('refresh_token')
+        if not refresh_token:
+            return False
+        try:
+            token_info = self.auth.refresh_access_token(refresh_token)
+        except Exception as e:
+            self.logger.warning(f'Spotify token refresh failed: {e}')
+            return False
+        with self._lock:
+            self._token_info = token_info
+        self.refreshes += 1
+        self.logger.info(f'Spotify token refreshed, valid for {token_info["expires_at"] - time.time():.0f}s')
+        return True
+
+    def _refresh_loop(self):
+        while True:
+            delay = max(0, self._expires_in() - self.refresh_margin)
+            self._refresh_requested.wait(delay)
+            self._refresh_requested.clear()
+            while not self._refresh():
+                time.sleep(self.retry_interval)
+
+    def request_refresh(self):
+        """Refresh in the background now, e.g. after the API rejected the token"""
+        self._refresh_requested.set()
+
+    def token_info(self) -> Optional[dict]:
+        """access_token and expires_at of the current token"""
+        with self._lock:
+            if self._token_info is None:
+                return None
+            return {'access_token': self._token_info['access_token'], 'expires_at': self._token_info['expires_at']}
+
+    def get_access_token(self, as_dict: bool = False):
+        """spotipy auth manager interface, returns the current token without blocking
+
+        Raises:
+            SpotifyOauthError: if there is no token, instead of letting spotipy send "Bearer None"
+        """
+        info = self.token_info()
+        if info is None:
+            from spotipy.oauth2 import SpotifyOauthError
+            raise SpotifyOauthError('No Spotify token, run the setup authorisation first')
+        return info if as_dict else info['access_token']
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                # socket closed
+                return
+            with conn:
+                try:
+                    conn.settimeout(1)
+                    if conn.recv(16).strip() == b'refresh':
+                        self.request_refresh()
+                    conn.sendall(json.dumps(self.token_info()).encode('utf-8'))
+                except OSError as e:
+                    self.logger.warning(f'Token request failed: {e}')
+
+    def close(self):
+        """Stop serving and remove the socket file"""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+
+class BrokerClient:
+    """spotipy auth manager that takes the token from the TokenBroker.
+
+    The token is kept until shortly before it expires. If the broker is
+    not reachable the fallback auth manager reads the token file itself.
+    """
+
+    def __init__(self, socket_path: str, fallback, logger, margin: float = 60, timeout: float = 1.0):
+        """
+        Args:
+            socket_path (str): broker socket path
+            fallback (SpotifyOAuth): used while the broker is not running
+            logger: service logger
+            margin (float, optional): seconds before expiry to fetch a new token
+            timeout (float, optional): socket timeout in seconds
+        """
+        self.socket_path = socket_path
+        self.fallback = fallback
+        self.logger = logger
+        self.margin = margin
+        self.timeout = timeout
+        self._token_info: Optional[dict] = None
+
+    def _ask(self, request: bytes) -> Optional[dict]:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                sock.sendall(request)
+                sock.shutdown(socket.SHUT_WR)
+                data = b''
+                while chunk := sock.recv(4096):
+                    data += chunk
+            return json.loads(data)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f'Token broker not reachable ({e}), using the token file')
+            return None
+
+    def get_access_token(self, as_dict: bool = False):
+        """spotipy auth manager interface"""
+        if self._token_info is None or self._token_info['expires_at'] - time.time() < self.margin:
+            self._token_info = self._ask(b'get')
+            if self._token_info is None:
+                return self.fallback.get_access_token(as_dict=as_dict)
+        return self._token_info if as_dict else self._token_info['access_token']
+
+    def invalidate(self):
+        """Drop the kept token and ask the broker to refresh, after the API rejected it"""
+        self._token_info = None
+        self._ask(b'refresh')
@@ -165,6 +165,61 @@ echo "album_cover_small = True" >> ${install_path}/config/eink_options.ini
 echo "; cleans the display every 20 picture" >> ${install_path}/config/eink_options.ini
 echo "; this takes ~60 seconds" >> ${install_path}/config/eink_options.ini
 echo "display_refresh_counter = 20" >> ${install_path}/config/eink_options.ini
+echo "; SPI clock of the Waveshare panels in Hz, lower it if the picture shows noise" >> ${install_path}/config/eink_options.ini
+echo "spi_speed_hz = 10000000" >> ${install_path}/config/eink_options.ini
+echo "; bytes per SPI transfer, defaults to the spidev bufsiz (usually 4096)" >> ${install_path}/config/eink_options.ini
+echo "; spi_chunk_size = 4096" >> ${install_path}/config/eink_options.ini
+echo "; seconds without a refresh before the display is put into deep sleep" >> ${install_path}/config/eink_options.ini
+echo "display_idle_sleep_s = 120" >> ${install_path}/config/eink_options.ini
+echo "; disk budget of the album cover cache in MB" >> ${install_path}/config/eink_options.ini
+echo "cover_cache_mb = 50" >> ${install_path}/config/eink_options.ini
+echo "; disk budget of the rendered frame cache in MB" >> ${install_path}/config/eink_options.ini
+echo "frame_cache_mb = 50" >> ${install_path}/config/eink_options.ini
+echo "; largest decoded idle image in MB, bigger photos are skipped" >> ${install_path}/config/eink_options.ini
+echo "idle_decode_budget_mb = 64" >> ${install_path}/config/eink_options.ini
+echo "; seconds between Spotify polls while a track plays (the end of a track is polled on time)" >> ${install_path}/config/eink_options.ini
+echo "poll_playing_s = 15" >> ${install_path}/config/eink_options.ini
+echo "; longest back-off between Spotify polls while nothing plays" >> ${install_path}/config/eink_options.ini
+echo "poll_idle_max_s = 30" >> ${install_path}/config/eink_options.ini
+echo "; seconds of fast polling after a button press" >> ${install_path}/config/eink_options.ini
+echo "poll_burst_s = 10" >> ${install_path}/config/eink_options.ini
+echo "; HTTP connect/read timeouts in seconds and retries for Spotify and cover downloads" >> ${install_path}/config/eink_options.ini
+echo "http_connect_timeout_s = 3.05" >> ${install_path}/config/eink_options.ini
+echo "http_read_timeout_s = 10" >> ${install_path}/config/eink_options.ini
+echo "http_retries = 3" >> ${install_path}/config/eink_options.ini
+echo "; blurred background quality: fast, balanced or exact" >> ${install_path}/config/eink_options.ini
+echo "background_quality = balanced" >> ${install_path}/config/eink_options.ini
+echo "; dithering: pil, none, bayer, blue_noise, floyd_steinberg or atkinson, gamma < 1 darkens the midtones" >> ${install_path}/config/eink_options.ini
+echo "dither_algorithm = pil" >> ${install_path}/config/eink_options.ini
+echo "dither_gamma = 1.0" >> ${install_path}/config/eink_options.ini
+echo "; accent color per album for the SONG label and the background tint" >> ${install_path}/config/eink_options.ini
+echo "accent_color = true" >> ${install_path}/config/eink_options.ini
+echo "accent_tint = 0.2" >> ${install_path}/config/eink_options.ini
+echo "; disk budget of the accent cache in KB" >> ${install_path}/config/eink_options.ini
+echo "accent_cache_kb = 1024" >> ${install_path}/config/eink_options.ini
+echo "; socket the button service signals the display service on" >> ${install_path}/config/eink_options.ini
+echo "event_socket = /tmp/spotipi-eink-events.sock" >> ${install_path}/config/eink_options.ini
+echo "; the display service refreshes the Spotify token this many seconds before it expires and hands it to the button service" >> ${install_path}/config/eink_options.ini
+echo "token_refresh_margin_s = 300" >> ${install_path}/config/eink_options.ini
+echo "token_socket = /tmp/spotipi-eink-token.sock" >> ${install_path}/config/eink_options.ini
+echo "; retries of a failed button command" >> ${install_path}/config/eink_options.ini
+echo "button_retries = 3" >> ${install_path}/config/eink_options.ini
+echo "; per refresh stage timings: Prometheus textfile and JSON lines, leave empty to disable" >> ${install_path}/config/eink_options.ini
+echo "metrics_textfile = /dev/shm/spotipi_eink.prom" >> ${install_path}/config/eink_options.ini
+echo "metrics_jsonl = /dev/shm/spotipi_eink.jsonl" >> ${install_path}/config/eink_options.ini
+echo "; pre-render the frames of the queue, recently played, saved albums and playlists while idle" >> ${install_path}/config/eink_options.ini
+echo "prewarm_library = False" >> ${install_path}/config/eink_options.ini
+echo "; walked sources: queue, recent, saved_albums, playlists" >> ${install_path}/config/eink_options.ini
+echo "prewarm_sources = queue,recent,saved_albums" >> ${install_path}/config/eink_options.ini
+echo "; playlist ids or URIs for the playlists source, comma separated" >> ${install_path}/config/eink_options.ini
+echo "prewarm_playlists = " >> ${install_path}/config/eink_options.ini
+echo "; Web API calls per minute and seconds between pre-warming passes while idle" >> ${install_path}/config/eink_options.ini
+echo "prewarm_api_calls_per_min = 6" >> ${install_path}/config/eink_options.ini
+echo "prewarm_interval_s = 1800" >> ${install_path}/config/eink_options.ini
+echo "; share of the frame cache budget one pre-warming pass may fill" >> ${install_path}/config/eink_options.ini
+echo "prewarm_cache_share = 0.5" >> ${install_path}/config/eink_options.ini
+echo "; niceness of the pre-warming thread" >> ${install_path}/config/eink_options.ini
+echo "prewarm_nice = 10" >> ${install_path}/config/eink_options.ini
 echo "username = ${spotify_username}" >> ${install_path}/config/eink_options.ini
 echo "token_file = ${spotify_token_path}" >> ${install_path}/config/eink_options.ini
 echo "spotipy_log = ${install_path}/log/spotipy.log" >> ${install_path}/config/eink_options.ini